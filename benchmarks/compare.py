@@ -0,0 +1,63 @@
+"""Compare two pytest-benchmark json files and fail on regressions.
+
+    pytest benchmarks/ --benchmark-json=baseline.json
+    # ... change code ...
+    pytest benchmarks/ --benchmark-json=current.json
+    python -m benchmarks.compare baseline.json current.json --threshold 10
+"""
+import sys
+import json
+import argparse
+
+
+def load(path, stat):
+    with open(path) as f:
+        data = json.load(f)
+    return dict((it['fullname'], it['stats'][stat]) for it in data['benchmarks'])
+
+
+def compare(baseline, current, threshold=10.0):
+    """Returns list of (name, base, current, percent) slower than `threshold` %"""
+    regressions = []
+
+    for name, base in sorted(baseline.items()):
+        if name not in current or not base:
+            continue
+
+        percent = (current[name] - base) / base * 100
+        if percent > threshold:
+            regressions.append((name, base, current[name], percent))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='fail when benchmarks got slower than baseline')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='allowed slowdown in percent (default 10)')
+    parser.add_argument('--stat', default='median',
+                        choices=['min', 'max', 'mean', 'median'])
+    args = parser.parse_args(argv)
+
+    baseline = load(args.baseline, args.stat)
+    current = load(args.current, args.stat)
+
+    regressions = compare(baseline, current, args.threshold)
+
+    for name, base, cur, percent in regressions:
+        print('SLOWER %+.1f%% %s: %.6fs -> %.6fs' % (percent, name, base, cur))
+
+    missing = set(baseline) - set(current)
+    for name in sorted(missing):
+        print('MISSING %s' % name)
+
+    print('%s benchmarks compared, %s regressions over %s%%' % (
+                len(set(baseline) & set(current)), len(regressions), args.threshold))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import time
+import pytest
+
+from slovar import slovar, convert
+
+
+BENCHMARK_OPTIONS = {
+    'min_rounds': 5,
+    'warmup': True,
+    'disable_gc': True,
+    'timer': time.time,
+}
+
+def options(group):
+    d = dict(BENCHMARK_OPTIONS)
+    d.update({'group': group})
+    return d
+
+
+# keys per level, nesting depth, list length and number of records per batch
+SIZES = [10, 100, 1000]
+DEPTHS = [1, 4, 16]
+LIST_LENGTHS = [10, 100, 1000]
+BATCH_SIZES = [100, 1000]
+
+
+def make_doc(size=10, depth=1, list_len=10):
+    leaf = dict(('k%s' % ix, 'val%s' % ix) for ix in range(size))
+    leaf['l'] = [{'id': ix, 'v': 'v%s' % ix} for ix in range(list_len)]
+
+    doc = leaf
+    for level in range(depth):
+        doc = dict(leaf, n=doc)
+
+    return slovar(doc)
+
+
+def deep_key(depth, key='k0'):
+    return '.'.join(['n'] * depth + [key])
+
+
+class TestSlovarScalingBenchmark(object):
+
+    @pytest.mark.parametrize('depth', DEPTHS)
+    @pytest.mark.parametrize('size', SIZES)
+    @pytest.mark.benchmark(**options('flat'))
+    def test_flat(self, benchmark, size, depth):
+        d = make_doc(size, depth)
+        benchmark(d.flat)
+
+    @pytest.mark.parametrize('depth', DEPTHS)
+    @pytest.mark.parametrize('size', SIZES)
+    @pytest.mark.benchmark(**options('unflat'))
+    def test_unflat(self, benchmark, size, depth):
+        d = make_doc(size, depth).flat(keep_lists=False)
+        benchmark(d.unflat)
+
+    @pytest.mark.parametrize('depth', DEPTHS)
+    @pytest.mark.parametrize('size', SIZES)
+    @pytest.mark.benchmark(**options('nested_get'))
+    def test_nested_get(self, benchmark, size, depth):
+        d = make_doc(size, depth)
+        key = deep_key(depth)
+        benchmark(d.nested_get, key)
+
+    @pytest.mark.parametrize('depth', DEPTHS)
+    @pytest.mark.parametrize('size', SIZES)
+    @pytest.mark.benchmark(**options('has'))
+    def test_has(self, benchmark, size, depth):
+        d = make_doc(size, depth)
+        benchmark(d.has, [deep_key(depth), 'k1'], check_type=str)
+
+    @pytest.mark.parametrize('depth', DEPTHS)
+    @pytest.mark.parametrize('size', SIZES)
+    @pytest.mark.benchmark(**options('diff'))
+    def test_diff(self, benchmark, size, depth):
+        d1 = make_doc(size, depth)
+        d2 = make_doc(size, depth)
+        d2.k0 = 'changed'
+        benchmark(d1.diff, d2)
+
+    @pytest.mark.parametrize('depth', DEPTHS)
+    @pytest.mark.parametrize('size', SIZES)
+    @pytest.mark.benchmark(**options('transform'))
+    def test_transform(self, benchmark, size, depth):
+        d = make_doc(size, depth)
+        rules = {deep_key(depth): 'x.y', 'k1': 'z'}
+        benchmark(d.transform, rules)
+
+    @pytest.mark.parametrize('trs,val', [
+        (['str', 'strip', 'int'], ' 10 '),
+        (['float', 'int', 'str'], '1'),
+        (['sort', '-id'], [{'id': ix} for ix in range(100)]),
+        (['ld2l', 'id'], [{'id': ix} for ix in range(100)]),
+        (['concat', 'COMMA'], list(range(100))),
+        (['split', ',', 'index', '1'], 'a,b,c'),
+        (['@len'], 'abc'),
+        (['upper'], 'abc'),
+    ], ids=['str_strip_int', 'float_int_str', 'sort', 'ld2l', 'concat', 'split_index',
+            'builtin', 'type_method'])
+    @pytest.mark.benchmark(**options('tcast'))
+    def test_tcast(self, benchmark, trs, val):
+        d = slovar()
+        benchmark(d.tcast, 'key', val, trs)
+
+    @pytest.mark.parametrize('list_len', LIST_LENGTHS)
+    @pytest.mark.benchmark(**options('update_with'))
+    def test_update_with_append_to_set(self, benchmark, list_len):
+        d = make_doc(list_len=list_len)
+        e = make_doc(size=0, list_len=list_len)
+        benchmark(d.update_with, e, append_to_set=['l:id'])
+
+    @pytest.mark.parametrize('list_len', LIST_LENGTHS)
+    @pytest.mark.benchmark(**options('update_with'))
+    def test_update_with_merge_to(self, benchmark, list_len):
+        d = make_doc(list_len=list_len)
+        e = make_doc(size=0, list_len=list_len)
+        benchmark(d.update_with, e, merge_to=['l:id'])
+
+    @pytest.mark.parametrize('list_len', LIST_LENGTHS)
+    @pytest.mark.benchmark(**options('update_with'))
+    def test_update_with_remove_from(self, benchmark, list_len):
+        d = make_doc(list_len=list_len)
+        e = make_doc(size=0, list_len=list_len // 2)
+        benchmark(d.update_with, e, remove_from=['l:id'])
+
+    @pytest.mark.parametrize('batch', BATCH_SIZES)
+    @pytest.mark.benchmark(**options('batch'))
+    def test_to_dicts(self, benchmark, batch):
+        records = [make_doc(10) for _ in range(batch)]
+        benchmark(slovar.to_dicts, records, 'k0,k1:upper,n.k2,l__as__items')
+
+    @pytest.mark.parametrize('batch', BATCH_SIZES)
+    @pytest.mark.benchmark(**options('batch'))
+    def test_iter_extract(self, benchmark, batch):
+        records = [make_doc(10) for _ in range(batch)]
+        benchmark(lambda: list(slovar.iter_extract(records, 'k0,k1:upper,n.k2,l__as__items')))
+
+    @pytest.mark.parametrize('name,value,kw', [
+        ('asbool', 'yes', {}),
+        ('aslist', 'a,b,c,d', {}),
+        ('asset', 'a,b,c,a', {}),
+        ('asint', '10', {}),
+        ('asfloat', '10.5', {}),
+        ('asstr', 10, {}),
+        ('asunicode', 10, {}),
+        ('asrange', '1-1000', {'typecast': int}),
+        ('asdict', 'a:1,b:2,a:3', {}),
+        ('asdt', '2020-01-01T10:00:00', {}),
+        ('asdtob', '2020-01-01T10:00:00', {}),
+        ('asqs', 'a=1&b=2&c.d=3', {}),
+    ], ids=lambda it: it if isinstance(it, str) and it.startswith('as') else None)
+    @pytest.mark.benchmark(**options('convert'))
+    def test_convert(self, benchmark, name, value, kw):
+        func = getattr(convert, name)
+
+        def _run():
+            return func(slovar(val=value), 'val', **kw)
+        benchmark(_run)
@@ -2,20 +2,24 @@ import re
 import logging
 import collections
 import logging
-import builtins
 import copy
+from copy import deepcopy as _deepcopy
+from array import array
+from functools import lru_cache
 from bson import ObjectId
 from datetime import datetime
 
 from slovar import convert
 from slovar.dictionaries import *
-from slovar.json import json_dumps
+from slovar.json import json_dumps, json_dump_iter, set_json_backend
 from slovar.lists import *
+from slovar.parallel import parallel_map
+from slovar.patch import make_patch, apply_patch
+from slovar.fingerprint import fingerprint
+from slovar.cache import ExtractCache
 from slovar.strings import *
-
-
-def ld2l(ld, key):
-    return [it[key] for it in ld]
+from slovar.transforms import TCAST_FUNCS, compile_tcast, register_transform, unregister_transform, \
+                              tcast_column
 
 
 def ld2dl(ld, key=None):
@@ -38,18 +42,117 @@ def parse_func_params(s):
         return []
 
 TCAST_NONE = True
-TCAST_FUNCS = ['sort', 'index', 'concat', 'slice', 'ld2l', 'split']
 
 log = logging.getLogger(__name__)
 
 
+_MISSING = object()
+
+
+def _needs_convert(val):
+    return isinstance(val, list) or (isinstance(val, dict) and not isinstance(val, slovar))
+
+
+def _to_slovar_value(val):
+    if isinstance(val, slovar):
+        return val
+    elif isinstance(val, dict):
+        return slovar(val)
+    elif isinstance(val, list):
+        new_list = []
+        for each in val:
+            if isinstance(each, dict) and not isinstance(each, slovar):
+                new_list.append(slovar(each))
+            else:
+                new_list.append(each)
+        return new_list
+    return val
+
+
+def _to_lazy_value(val):
+    if isinstance(val, slovar):
+        return val
+    elif isinstance(val, dict):
+        return slovar.lazy(val)
+    elif isinstance(val, list):
+        new_list = []
+        for each in val:
+            if isinstance(each, dict) and not isinstance(each, slovar):
+                new_list.append(slovar.lazy(each))
+            else:
+                new_list.append(each)
+        return new_list
+    return val
+
+
+_ATOMS = frozenset([str, int, float, bool, type(None), datetime, ObjectId])
+
+
+def _copy_tree(val, memo):
+    # `copy.deepcopy` for json like documents: plain slovars, dicts and lists
+    # are copied here, immutable leaves are shared, the rest goes to deepcopy
+    cls = type(val)
+    if cls in _ATOMS:
+        return val
+
+    if cls is slovar:
+        if val.__dict__:
+            return _deepcopy(val, memo)
+    elif cls is not dict and cls is not list:
+        return _deepcopy(val, memo)
+
+    val_id = id(val)
+    if val_id in memo:
+        return memo[val_id]
+
+    if cls is list:
+        new = memo[val_id] = []
+        for each in val:
+            new.append(_copy_tree(each, memo))
+    else:
+        new = memo[val_id] = cls.__new__(cls)
+        for kk, vv in dict.items(val):
+            dict.__setitem__(new, kk, _copy_tree(vv, memo))
+
+    return new
+
+
 class slovar(dict):
     """Named dict, with some set functionalities
     """
 
     @classmethod
     def to_dicts(cls, iterable, fields):
-        return [e.extract(fields) for e in iterable]
+        _extract = cls.compile_extract(fields)
+        return [_extract(e) for e in iterable]
+
+    @classmethod
+    def iter_extract(cls, iterable, fields, defaults=None, chunk_size=None):
+        # lazy version of `to_dicts`. with `chunk_size` yields lists of results
+        _extract = cls.compile_extract(fields, defaults)
+
+        if not chunk_size:
+            for each in iterable:
+                yield _extract(each)
+            return
+
+        chunk = []
+        for each in iterable:
+            chunk.append(_extract(each))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    @classmethod
+    def to_columns(cls, iterable, fields, defaults=None, typed=False):
+        return extract_columns(iterable, fields, defaults=defaults, typed=typed)
+
+    @classmethod
+    def parallel_map(cls, records, op='extract', **kw):
+        return parallel_map(records, op=op, **kw)
 
     @classmethod
     def from_dotted(cls, dotkey, val):
@@ -71,6 +174,17 @@ class slovar(dict):
         else:
             return cls({key: cls.from_dotted(sufix, val)})
 
+    @classmethod
+    def lazy(cls, *arg, **kw):
+        # same as `cls(*arg, **kw)`, but nested values are converted
+        # on first access instead of upfront. see `_LazySlovar`
+        lazy_cls = _lazy_type(cls)
+        new = lazy_cls.__new__(lazy_cls)
+        dict.__init__(new, *arg, **kw)
+        object.__setattr__(new, '_lazy_pending',
+                set(kk for kk, vv in dict.items(new) if _needs_convert(vv)))
+        return new
+
     def __init__(self, *arg, **kw):
         super().__init__(*arg, **kw)
 
@@ -81,13 +195,7 @@ class slovar(dict):
             elif isinstance(val, dict):
                 self[key] = slovar(val)
             elif isinstance(val, list):
-                new_list = []
-                for each in val:
-                    if isinstance(each, dict) and not isinstance(each, slovar):
-                        new_list.append(slovar(each))
-                    else:
-                        new_list.append(each)
-                self[key] = new_list
+                self[key] = _to_slovar_value(val)
 
     def __call__(self, key):
         return self.extract(key)
@@ -147,10 +255,10 @@ class slovar(dict):
         return slovar(dct)
 
     def copy(self):
-        return copy.deepcopy(self)
+        return _copy_tree(self, {})
 
     def deepcopy(self):
-        return copy.deepcopy(self)
+        return _copy_tree(self, {})
 
     def tcast(self, key, val, trs):
 
@@ -158,239 +266,25 @@ class slovar(dict):
             log.debug('extracted key %r is None' % key)
             return val
 
-        prev_tr = None
-
-        def concat(val, sep=''):
-            SEP = slovar(
-                COMMA=',',
-                SPACE=' ',
-            )
-
-            sep = SEP.get(sep, sep)
-
-            if isinstance(val, list):
-                return sep.join([str(it) for it in val if it])
-            else:
-                return str(val)
-
-        for tr in trs:
-            try:
-                if 'safe' == tr or 'safe_none' == tr:
-                    continue
-
-                elif tr in ('str', 'unicode'):
-                    val = str(val)
-
-                elif tr == 'int':
-                    val = int(val)
-
-                elif tr == 'float':
-                    val = float(val)
-
-                elif tr == 'bool':
-                    val = bool(val)
-
-                elif tr == 'flat' and isinstance(val, slovar):
-                    val = val.flat()
+        return compile_tcast(trs)(val, key, self.bad_value_error_klass)
 
-                elif tr == 'flatall' and isinstance(val, slovar):
-                    val = val.flat(keep_lists=False)
-
-                elif tr == 'unflat' and isinstance(val, slovar):
-                    val = val.unflat()
-
-                elif tr == 'dt':
-                    if val:
-                        val = str2dt(val)
-
-                elif tr == 'ts2dt':
-                    if val:
-                        val = datetime.utcfromtimestamp(val).strftime('%Y-%m-%d %H:%M:%S')
-
-                elif tr == 'dtob':
-                    if val:
-                        val = ObjectId(val).generation_time
-
-                elif tr == 'strip':
-                    if isinstance(val, str):
-                        val = val.strip()
-
-                # elif tr == 'ld2dl' and isinstance(val, list):
-                #     val = ld2dl(val)
-
-                elif tr in TCAST_FUNCS:
-                    prev_tr = tr
-
-                elif prev_tr:
-                    if prev_tr == 'sort':
-                        reverse = False
-                        if tr[0] in ['-', '+']:
-                            reverse = tr[0] == '-'
-                            tr = tr[1:]
-                        val = sort_list(val, tr, reverse = reverse)
-
-                    elif prev_tr == 'index':
-                        val = val[int(tr)]
-
-                    elif prev_tr == 'concat':
-                        val = concat(val, tr or '')
-
-                    elif prev_tr == 'slice':
-                        val = val[:int(tr)]
-
-                    elif prev_tr == 'ld2l':
-                        val = ld2l(val, tr)
-
-                    elif prev_tr == 'split':
-                        if isinstance(val, str):
-                            val = val.split(tr)
-
-                    prev_tr = None
-
-                elif tr.startswith('@'):
-                    tr = tr[1:]
-                    val = getattr(builtins, tr)(val)
-
-                else:
-                    _type = type(val)
-                    try:
-                        method = getattr(_type, tr)
-                        if not isinstance(method, collections.Callable):
-                            raise self.bad_value_error_klass('`%s` is not a callable for type `%s`' % (tr, _type))
-                        val = method(val)
-                    except AttributeError as e:
-                        raise self.bad_value_error_klass('type `%s` does not have a method `%s`' % (_type, tr))
-
-            except:
-                import sys
-                msg = 'typecast failed for key=`%s`, value=`%s`: %s' % (key, val, sys.exc_info()[1])
-                log.error(msg)
-
-                if 'safe' in trs:
-                    return val
-                elif 'safe_none' in trs:
-                    return None
-                else:
-                    raise self.bad_value_error_klass(msg)
-
-        return val
+    @classmethod
+    def compile_extract(cls, fields, defaults=None):
+        return Extractor(fields, defaults)
 
-    def extract(self, fields, defaults=None):
+    def extract(self, fields, defaults=None, cache=None, cache_key=None):
+        # `cache` is an `ExtractCache`, only used when `cache_key` identifies this document
 
         if not fields:
             return self
 
-        op = process_fields(fields)
-
-        def process_assignments(_d):
-            for kk, vv in op.assignments.items():
-                op.transforms.pop(kk, None)
-
-                val, _, tr = vv.partition(':')
-
-                if val == '__NOW__':
-                    val = datetime.utcnow()
-                elif val == '__TODAY__':
-                    val = datetime.today()
-                elif val == '__OID__':
-                    val = str(ObjectId())
-                elif val == '__NULL__':
-                    val = {}
-
-                if '..' in kk:
-                    list_key, new_key = kk.split('..')
-                    new_val = []
-
-                    for it in _d[list_key]:
-                        if tr:
-                            val = self.tcast(list_key, val, split_strip(tr, '|'))
-
-                        new_val.append(it.update({new_key:val}))
-
-                    if new_val:
-                        _d[list_key] = new_val
-
-                else:
-                    trs = split_strip(tr, '|')
-                    if 'default' in trs:
-                        trs.remove('default')
-                        if kk in _d:
-                            continue
-
-                    _d[kk] = self.tcast(kk, val, trs) if trs else val
-
-            return _d
-
-        def process_show_as(_d):
-            if not op.show_as_r:
-                return _d
-
-            _d_show_as = slovar()
-
-            for new_key, key in list(op.show_as_r.items()):
-                try:
-                    _d_show_as[new_key] = _d.nested_get(key)
-                except (KeyError,IndexError):
-                    pass
-
-            _d_remainder = slovar()
-            for kk, count in collections.Counter(op.exp_only).items():
-                if kk in op.show_as:
-                    if len(op.show_as[kk]) == count:
-                        if op.star:
-                            _d = _d.nested_pop(kk)
-                        continue
-
-                if not op.star:
-                    _d_remainder = _d_remainder.update_with(_d.subset(kk), flatten=kk)
-
-            _d_show_as.update(_d_remainder)
-
-            if op.star:
-                return _d_show_as.merge(_d)
-
-            return _d_show_as
-
-        def process_trans(_d):
-            for key, trs in list(op.transforms.items()):
-                if key in _d:
-                    _d[key] = self.tcast(key, _d.get(key), trs)
-            return _d
-
-        def process_flats(_d):
-            for fld, keep in op.flats.items():
-                _d = _d.flat([fld], keep_lists=keep)
-
-            return _d
-
-        def process_unflats(_d):
-            if op.unflats:
-                _d = _d.unflat(op.unflats)
-
-            return _d
+        if cache is not None:
+            return cache.extract(self, fields, defaults, key=cache_key)
 
-        def process_defaults(_d):
-            if defaults:
-                _d = _d.update_with(defaults, overwrite=False)
+        if defaults:
+            return Extractor(fields, defaults)(self)
 
-            return _d
-
-        def process_envelope(_d):
-            if op.envelope:
-                _d = slovar({op.envelope:_d})
-
-            return _d
-
-        _d = self._subset(op)
-        _d = process_flats(_d)
-        _d = process_show_as(_d)
-        _d = process_assignments(_d)
-        _d = process_trans(_d)
-        _d = process_unflats(_d)
-        _d = process_defaults(_d)
-        _d = process_envelope(_d)
-
-        return _d
+        return _cached_extractor(compile_fields(fields))(self)
 
     def get_by_prefix(self, prefix):
         if not isinstance(prefix, list):
@@ -421,37 +315,40 @@ class slovar(dict):
 
         return _d
 
-    def _subset(self, op):
+    def _subset(self, op, exp_only=None):
         _d = slovar()
 
         if op.star:
             _d = self.copy()
 
-        exp_only = op.exp_only[:]
+        if exp_only is None:
+            exp_only = list(op.exp_only)
+
         only_nested_flds = []
 
-        if exp_only:
-            for fld in exp_only:
+        if op.exp_only:
+            for fld in op.exp_only:
                 if fld in self:
                     _d[fld] = self[fld]
                 else:
                     try:
+                        # copies, results must not share nested values with self
                         if fld.endswith('.*'):
-                            val = self.nested_get(fld)
+                            val = self.nested_get(fld, copy=True)
                             if isinstance(val, dict):
                                 # checking if val keys will overwrite the self
                                 # conflict = self.set_keys() & val.set_keys()
                                 # if conflict and op.star:
                                 #     raise self.missing_key_error_klass(
                                 #         'conflict with `%s` field. Reducing to a existing name' % conflict)
-                                op.exp_only.extend(val.keys())
+                                exp_only.extend(val.keys())
                                 _d.update(val)
                             else:
                                 raise self.bad_value_error_klass('%s must be dict, got %s' % (val, type(val)))
                         elif fld.endswith('*'):
                             _d.update(self.get_by_prefix(fld))
                         else:
-                            _d[fld] = self.nested_get(fld)
+                            _d[fld] = self.nested_get(fld, copy=True)
 
                         only_nested_flds.append(fld)
                     except (KeyError, IndexError):
@@ -470,7 +367,7 @@ class slovar(dict):
         if not keys:
             return slovar()
 
-        return self._subset(process_fields(keys)).merge_with(defaults)
+        return self._subset(compile_fields(keys)).merge_with(defaults)
 
     def remove(self, keys, flat=False):
 
@@ -493,7 +390,10 @@ class slovar(dict):
         return _self.unflat() if flat else _self
 
     def update(self, d_):
-        super(slovar, self).update(slovar(d_))
+        if not isinstance(d_, slovar):
+            d_ = slovar(d_)
+
+        super(slovar, self).update(d_)
         return self
 
     def merge(self, d_):
@@ -509,24 +409,31 @@ class slovar(dict):
                 self.pop(k)
         return self
 
-    def nested_get(self, fld):
-        _d = self.copy()
+    def nested_get(self, fld, copy=False):
+        # walks the live document. `copy=True` returns an isolated value
+        val = self._nested_get(fld)
+        return _deepcopy(val) if copy else val
+
+    def _nested_get(self, fld):
+        path = compile_path(fld)
+        fld = path.path
 
-        if fld in _d or '.' not in fld:
-            return _d[fld]
+        if fld in self or len(path) == 1:
+            return self[fld]
 
-        for kk in fld.split('.'):
+        _d = self
+        for kk, ix in zip(path.keys, path.indexes):
             if '*' == kk:
                 break
             # if its a list then access it by index
             if isinstance(_d, list):
-                if kk.isdigit():
-                    kk = int(kk)
+                if ix is not None:
+                    kk = ix
                 else:
                     val_lst = []
                     for it in _d:
                         if isinstance(it, slovar):
-                           val_lst.append(it.nested_get(kk))
+                           val_lst.append(it._nested_get(kk))
                     return val_lst
 
             _d = _d[kk]
@@ -534,13 +441,16 @@ class slovar(dict):
         return _d
 
     def nested_in(self, fld):
+        path = compile_path(fld)
+        fld = path.path
+
         if fld in self:
             return True
-        elif '.' not in fld:
+        elif len(path) == 1:
             return False
 
         inner = self
-        for kk in fld.split('.'):
+        for kk in path.keys:
             if isinstance(inner, dict) and kk in inner:
                 inner = inner[kk]
             else:
@@ -548,29 +458,32 @@ class slovar(dict):
 
         return True
 
-    def nested_pop(self, flds):
-        self_d = self.copy()
+    def nested_pop(self, flds, copy=True):
+        # `copy=False` pops in place and returns self
+        self_d = self.copy() if copy else self
 
-        if isinstance(flds, str):
+        if isinstance(flds, (str, Path)):
             flds = [flds]
 
         def _pop(fld):
-            if fld in self or '.' not in fld:
+            path = compile_path(fld)
+            fld = path.path
+
+            if fld in self or len(path) == 1:
                 self_d.pop(fld)
                 return self_d
 
-            parts = fld.split('.')
             _d = self_d
 
-            for kk in parts[:-1]:
+            for kk, ix in zip(path.keys[:-1], path.indexes[:-1]):
                 if isinstance(_d, list):
-                    kk = int(kk)
+                    kk = int(kk) if ix is None else ix
                 _d = _d[kk]
 
             try:
-                kk = parts[-1]
+                kk = path.keys[-1]
                 if isinstance(_d, list):
-                    kk = int(kk)
+                    kk = int(kk) if path.indexes[-1] is None else path.indexes[-1]
                 _d.pop(kk)
 
             except (KeyError, IndexError) as e:
@@ -603,76 +516,37 @@ class slovar(dict):
         for it in keys:
             self.pop(it, None)
 
+    @classmethod
+    def compile_has(cls, schema, _all=True):
+        return Validator(schema, _all=_all, errors=cls())
+
     def has(self, keys, check_type=str,
             err='', _all=True, allow_missing=False,
             allowed_values=[], forbidden_values=[]):
-        errors = []
 
         if isinstance(keys, str):
             keys = [keys]
 
-        self_flat = self.flat().update(self) # update with self to include high level keys too
-
-        def missing_key_error(_type, key):
-            if _type == dict:
-                missing = ['%s.%s' % (key, val) for val in allowed_values]
-            else:
-                missing = allowed_values
-
-            return 'Missing key or invalid values for `%s`. Allowed values are: `%s`'\
-                                          % (key, missing)
-
-        def error_msg(msg):
-            if "%s" in err:
-                error = err % msg
-            elif err:
-                error = err
-            else:
-                error = msg
-
-            errors.append(error)
-            return error
-
-        for key in keys:
-            if key in self_flat:
-                if check_type and not isinstance(self_flat[key], check_type):
-                    error_msg('`%s` must be type `%s`, got `%s` instead'\
-                                          % (key, check_type.__name__,
-                                             type(self_flat[key]).__name__))
-
-                if allowed_values and self_flat[key] not in allowed_values:
-                    error_msg(missing_key_error(check_type, key))
-
-                if self_flat[key] in forbidden_values:
-                    error_msg('`%s`=`%s` value is not allowed' % (key, self_flat[key]))
+        rule = dict(type=check_type, err=err, required=not allow_missing,
+                    allowed=allowed_values, forbidden=forbidden_values)
 
-            elif not allow_missing:
-                if allowed_values:
-                    error_msg(missing_key_error(check_type, key))
-                else:
-                    error_msg('Missing key: `%s`' % key)
-
-        if (errors and _all) or (not _all and len(errors) >= len(keys)):
-            raise self.bad_value_error_klass('.'.join(errors))
-
-        return True
+        return Validator([(key, rule) for key in keys], _all=_all, errors=self)(self)
 
     def transform(self, rules):
         _d = slovar()
-        flat_dict = self.flat()
 
-        for path, val in list(flat_dict.items()):
+        for path, val in dict(self.iter_flat()).items():
             if path in rules:
                 _d.merge(slovar.from_dotted(rules[path], val))
 
         return _d
 
-    def flat_keys(self, keys, keep_lists=True, sep='.'):
-        self_ = self.copy()
+    def flat_keys(self, keys, keep_lists=True, sep='.', inplace=False):
+        self_ = self if inplace else self.copy()
         for key in keys:
             val = self_.subset(key)
             if val and isinstance(val, dict):
-                self_ = self_.nested_pop(key)
+                self_ = self_.nested_pop(key, copy=False)
                 self_.update(val.flat(keep_lists=keep_lists, sep=sep))
 
         return self_
@@ -683,224 +557,43 @@ class slovar(dict):
 
         return slovar(flat(self, keep_lists=keep_lists, sep=sep))
 
+    def iter_flat(self, keep_lists=True, sep='.'):
+        return iter_flat(self, keep_lists=keep_lists, sep=sep)
+
     def unflat(self, only=[]):
         return slovar(unflat(self, only))
 
     def set_default(self, name, val):
         cls = slovar
-        if name not in self.flat():
+        if not flat_contains(self, name):
             self.merge(cls.from_dotted(name, val))
         return val
 
     def with_defaults(self, **defaults):
         return self.update_with(defaults, overwrite=False)
 
-    def fget(self, key, *arg, **kw):
-        return self.flat().get(key, *arg, **kw)
+    def fget(self, key, default=None):
+        val = flat_get(self, key, _MISSING)
+        return default if val is _MISSING else _to_slovar_value(val)
+
+    @classmethod
+    def compile_update(cls, **kw):
+        return Updater(errors=cls(), **kw)
 
     def update_with(self, _dict, overwrite=True, append_to=None,
                                                  append_to_set=None,
                                                  flatten=None,
                                                  merge_to=None,
-                                                 remove_from=None):
+                                                 remove_from=None,
+                                                 inplace=False):
 
-        self_dict = self.copy()
         if not _dict:
-            return self_dict
-
-        def process_append_to_param(_lst):
-            if isinstance(_lst, str):
-                _lst = [_lst]
-
-            if not _lst:
-                return {}
-
-            _d = {}
-            for each in (_lst or []):
-                k,_,sk = each.partition(':')
-                _d[k]=sk
-
-                #reference to nested field?
-                if '.' in k and (not flatten or (isinstance(flatten, list) and k.split('.')[0] not in flatten)):
-                    raise self.bad_value_error_klass(
-                        'list operation referrers to nested field `%s` without flattening.'
-                        ' forgot to pass `flatten=%s`?' % (k, k.split('.')[0]))
-            return _d
-
-        append_to = process_append_to_param(append_to)
-        append_to_set = process_append_to_param(append_to_set)
-        merge_to = process_append_to_param(merge_to)
-        remove_from = process_append_to_param(remove_from)
-
-        def _build_list(_lst, new_val):
-            if isinstance(_lst, list):
-                if isinstance(new_val, list):
-                    _lst.extend(new_val)
-                else:
-                    _lst.append(new_val)
-            else:
-                raise self.bad_value_error_klass('`%s` is not a list' % key)
-
-            return _lst
-
-        def _append_to(self_dict, key, val):
-            _lst = _build_list(self_dict.get(key, []), val)
-            sort_key = append_to.get(key)
-            sort_method = None
-            reverse = False
-
-            if sort_key:
-                if sort_key.startswith('-'):
-                    sort_key = sort_key[1:]
-                    reverse = True
-                elif sort_key.startswith('+'):
-                    sort_key = sort_key[1:]
-
-                if sort_key:
-                    sort_method = lambda x: x.get(sort_key)
-
-                _lst = sorted(_lst, key=sort_method, reverse=reverse)
-
-            return _lst
-
-        def _append_to_set(self_dict, key, val):
-            new_lst = _build_list(self_dict.get(key, []), val)
-            set_key = append_to_set.get(key)
-
-            if set_key.startswith('-'):
-                reverse_order = True
-                set_key = set_key[1:]
-            else:
-                reverse_order = False
-
-            #ie append_to_set=people:full_name. `full_name` is a set_key
-            #this will mean make people unique for inner field `full_name`
-            if set_key:
-                _uniques = []
-                _met = []
-                _not_found = []
-
-                #reverse the list so new values overwrite old ones,
-                #since it was appended at the end
-                for each in reversed(new_lst):
-                    if not each:
-                        log.debug('Empty item in the `%s:%s` list.Skip.', key, set_key)
-                        continue
-
-                    if set_key not in each:
-                        _not_found.append(each)
-                        continue
-
-                    if each[set_key] in _met:
-                        continue
-
-                    _met.append(each[set_key])
-                    _uniques.append(each)
-
-                new_lst = sorted(_uniques, key= lambda x: x.get(set_key), reverse=reverse_order)
-                new_lst.extend(_not_found)
-            else:
-                try:
-                    new_lst = list(set(new_lst))
-                except TypeError as e:
-                    raise self.bad_value_error_klass('items in `%s` list not hashable. missed the set_key ?'\
-                                     % (key))
-
-            return new_lst
-
-        def _merge_to(self_dict, key, val):
-            set_key = merge_to.get(key)
-            new_lst = []
-            new_keys = []
-
-            if not set_key:
-                raise self.bad_value_error_klass('merge_to must contain a set key')
-
-            if not isinstance(val, list):
-                val = [val]
-
-            for each in self_dict.get(key, []):
-                if each.get(set_key):
-                    for it in val:
-                        if not it.get(set_key):
-                            continue
-
-                        if it[set_key] == each[set_key]:
-                            each = each.update_with(it)
-
-                        new_keys.append(it[set_key])
-
-                new_lst.append(each)
-
-            return new_lst
-
-        def _remove_from(self_dict, key, val):
-            set_key = remove_from.get(key)
-            new_lst = self_dict.get(key, [])[:] # copy
-
-            for vv in val:
-                for vvv in new_lst:
-                    if set_key:
-                        if not isinstance(vv, dict) or not isinstance(vvv, dict):
-                            raise self.bad_value_error_klass(
-                                'set key `%s` can be specified only for dicts. Got : `%s` and `%s`' % (
-                                                                                        set_key, vv, vvv))
-
-                        if set_key in vv and vv[set_key] == vvv.get(set_key, None):
-                            new_lst.remove(vvv)
-                    else:
-                        if vv == vvv:
-                            new_lst.remove(vvv)
-
-            return new_lst
-
-        def can_overwrite(key, overwrite, flat_overwrites):
-            if overwrite == True:
-                return True
-
-            if isinstance(overwrite, list):
-                if flatten == True:
-                    return True
-
-                for it in flat_overwrites:
-                    if key.startswith('%s.'%it):
-                        return True
-
-                if key in overwrite:
-                    return True
-
-            return False
-
-        flat_overwrites = set()
-        if flatten:
-            flat_keys = flatten if isinstance(flatten, list) else None
-            self_dict = self_dict.flat(keys=flat_keys)
-            _dict = _dict.flat(keys=flat_keys)
-
-            if flat_keys and isinstance(overwrite, list):
-                s_overwrites = set(overwrite)
-                flat_overwrites = (set(flat_keys) & s_overwrites)
-                overwrite = list(s_overwrites - flat_overwrites)
-
-        for key, val in list(_dict.items()):
-
-            if key in append_to:
-                self_dict[key] = _append_to(self_dict, key, val)
-            elif key in append_to_set:
-                self_dict[key] = _append_to_set(self_dict, key, val)
-            elif key in merge_to:
-                self_dict[key] = _merge_to(self_dict, key, val)
-            elif key in remove_from:
-                self_dict[key] = _remove_from(self_dict, key, val)
-            elif key not in self_dict:
-                self_dict[key] = val
-            elif overwrite and can_overwrite(key, overwrite, flat_overwrites):
-                self_dict[key] = val
-
-        if flatten:
-            self_dict = self_dict.unflat()
+            return self if inplace else self.copy()
 
-        return self_dict
+        return Updater(overwrite=overwrite, append_to=append_to,
+                       append_to_set=append_to_set, flatten=flatten,
+                       merge_to=merge_to, remove_from=remove_from,
+                       inplace=inplace, errors=self)(self, _dict)
 
     def merge_with(self, _dict):
         return self.update_with(_dict, overwrite=False)
@@ -948,7 +641,6 @@ class slovar(dict):
 
         self_diff = slovar()
         sl2_diff = slovar()
-        _diff = slovar()
 
         if diff_fields:
             diff_fields = list(_self.extract(diff_fields).keys())
@@ -958,19 +650,28 @@ class slovar(dict):
             sl2v = sl2.get(kk, None)
 
             if selfv != sl2v:
-                _diff[kk] = {'from': selfv, 'to': sl2v}
                 self_diff[kk] = selfv
                 sl2_diff[kk] = sl2v
 
         if not diff_fields:
             #iterate through missing keys in _self
             for kk in set(sl2.keys())-set(_self.keys()):
-                _diff[kk] = {'from': None, 'to': sl2[kk]}
                 self_diff[kk] = None
                 sl2_diff[kk] = sl2[kk]
 
         return self_diff, sl2_diff
 
+    def fingerprint(self):
+        return fingerprint(self)
+
+    def diff_patch(self, other, jsonpatch=False):
+        # list of add/remove/replace changes turning self into `other`
+        return make_patch(self, other, jsonpatch=jsonpatch)
+
+    def apply_patch(self, patch, inplace=False):
+        _self = self if inplace else self.copy()
+        return apply_patch(_self, patch, convert=_to_slovar_value)
+
     def add_to_list(self, list_name, items, unique=False, position=None, sort_key=None):
         _self = self
 
@@ -1018,6 +719,15 @@ class slovar(dict):
         except ValueError as e:
             raise self.bad_value_error_klass(e)
 
+    def parse(self, schema):
+        # `schema` is a `convert.Schema` or the params dict to build one
+        if not isinstance(schema, convert.Schema):
+            schema = convert.Schema(schema)
+        try:
+            return schema(self)
+        except ValueError as e:
+            raise self.bad_value_error_klass(e)
+
     def asbool(self, *arg, **kw):
         return self.call_converter('asbool', *arg, **kw)
 
@@ -1055,6 +765,758 @@ class slovar(dict):
     def json(self):
         return json_dumps(self)
 
+    def json_dump(self, fp, **kw):
+        return json_dump_iter(self, fp, **kw)
+
     def set_keys(self):
         #useful for testing mainly
         return set(self.keys())
+
+
+class _LazySlovar(object):
+    """Mixed into the class of `slovar.lazy` instances. Values listed in
+    `_lazy_pending` are converted the first time they are handed out,
+    plain slovars never go through these overrides.
+    """
+
+    def __getitem__(self, key):
+        self._lazy_convert(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self._lazy_convert(key)
+        return super().get(key, default)
+
+    def pop(self, key, *arg):
+        self._lazy_convert(key)
+        return super().pop(key, *arg)
+
+    def setdefault(self, key, default=None):
+        self._lazy_convert(key)
+        return super().setdefault(key, default)
+
+    def popitem(self):
+        self._lazy_convert_all()
+        return super().popitem()
+
+    def items(self):
+        self._lazy_convert_all()
+        return super().items()
+
+    def values(self):
+        self._lazy_convert_all()
+        return super().values()
+
+    def __iter__(self):
+        # makes `dict(d)`, `{**d}` and `dict.update(d)` read the values
+        # through `__getitem__` instead of straight from the dict storage
+        return dict.__iter__(self)
+
+    def to_dict_type(self):
+        self._lazy_convert_all()
+        return super().to_dict_type()
+
+    def __deepcopy__(self, memo):
+        new = memo[id(self)] = self.__class__.__new__(self.__class__)
+        for kk, vv in dict.items(self):
+            dict.__setitem__(new, kk, _copy_tree(vv, memo))
+        object.__setattr__(new, '_lazy_pending', set(self._lazy_pending))
+        return new
+
+    def __reduce_ex__(self, protocol):
+        # the lazy class can not be imported, pickle a plain one instead
+        return self._lazy_base, (self.to_dict_type(),)
+
+    def _lazy_convert(self, key):
+        pending = self._lazy_pending
+        if key not in pending:
+            return
+
+        pending.discard(key)
+        # the value may have been replaced or deleted since
+        if dict.__contains__(self, key):
+            dict.__setitem__(self, key, _to_lazy_value(dict.__getitem__(self, key)))
+
+    def _lazy_convert_all(self):
+        for key in list(self._lazy_pending):
+            self._lazy_convert(key)
+
+
+@lru_cache(maxsize=None)
+def _lazy_type(cls):
+    if issubclass(cls, _LazySlovar):
+        return cls
+
+    return type(cls.__name__, (_LazySlovar, cls), {
+        '__module__': cls.__module__,
+        '__qualname__': cls.__qualname__,
+        '_lazy_base': cls,
+    })
+
+
+NONDETERMINISTIC_VALUES = ('__NOW__', '__TODAY__', '__OID__')
+
+
+class Extractor(object):
+    """Reusable callable for `slovar.extract` with a fixed field spec.
+
+    Only the stages the spec actually needs are resolved at compile time,
+    so `a,b,c` costs just the `_subset` call per record.
+    """
+
+    def __init__(self, fields, defaults=None):
+        self.op = op = compile_fields(fields)
+        self.defaults = defaults
+        self.stages = []
+        # results with generated values can't be reused
+        self.cacheable = not any(vv.partition(':')[0] in NONDETERMINISTIC_VALUES
+                                                for vv in op.assignments.values())
+
+        if op.flats:
+            self.stages.append(self.process_flats)
+        if op.show_as_r:
+            self.show_as_paths = [(kk, compile_path(vv)) for kk, vv in op.show_as_r.items()]
+            self.stages.append(self.process_show_as)
+        if op.assignments:
+            self.assignments = self._compile_assignments(op.assignments)
+            self.stages.append(self.process_assignments)
+        if op.transforms:
+            self.stages.append(self.process_trans)
+        if op.unflats:
+            self.stages.append(self.process_unflats)
+        if defaults:
+            self.stages.append(self.process_defaults)
+        if op.envelope:
+            self.stages.append(self.process_envelope)
+
+    def __call__(self, dset):
+        if not isinstance(dset, slovar):
+            # only the values the fields touch get converted
+            dset = slovar.lazy(dset)
+
+        if not self.op:
+            return dset
+
+        # `_subset` may expand `.*` fields; keep that per call, not on the plan
+        exp_only = list(self.op.exp_only)
+        _d = dset._subset(self.op, exp_only)
+
+        for stage in self.stages:
+            _d = stage(dset, _d, exp_only)
+
+        return _d
+
+    @staticmethod
+    def _compile_assignments(assignments):
+        compiled = []
+        for kk, vv in assignments.items():
+            val, _, tr = vv.partition(':')
+            trs = split_strip(tr, '|')
+
+            if '..' in kk:
+                list_key, new_key = kk.split('..')
+                compiled.append((kk, val, trs, list_key, new_key, False))
+            else:
+                is_default = 'default' in trs
+                if is_default:
+                    trs.remove('default')
+                compiled.append((kk, val, trs, None, None, is_default))
+
+        return compiled
+
+    @staticmethod
+    def _assignment_value(val):
+        if val == '__NOW__':
+            return datetime.utcnow()
+        elif val == '__TODAY__':
+            return datetime.today()
+        elif val == '__OID__':
+            return str(ObjectId())
+        elif val == '__NULL__':
+            return {}
+        return val
+
+    def process_assignments(self, dset, _d, exp_only):
+        for kk, val, trs, list_key, new_key, is_default in self.assignments:
+            val = self._assignment_value(val)
+
+            if list_key is not None:
+                new_val = []
+
+                for it in _d[list_key]:
+                    if trs:
+                        val = dset.tcast(list_key, val, trs)
+
+                    new_val.append(it.update({new_key:val}))
+
+                if new_val:
+                    _d[list_key] = new_val
+
+            else:
+                if is_default and kk in _d:
+                    continue
+
+                _d[kk] = dset.tcast(kk, val, trs) if trs else val
+
+        return _d
+
+    def process_show_as(self, dset, _d, exp_only):
+        op = self.op
+        _d_show_as = slovar()
+
+        for new_key, path in self.show_as_paths:
+            try:
+                _d_show_as[new_key] = _d.nested_get(path, copy=True)
+            except (KeyError,IndexError):
+                pass
+
+        _d_remainder = slovar()
+        for kk, count in collections.Counter(exp_only).items():
+            if kk in op.show_as:
+                if len(op.show_as[kk]) == count:
+                    if op.star:
+                        _d = _d.nested_pop(kk, copy=False)
+                    continue
+
+            if not op.star:
+                _d_remainder = _d_remainder.update_with(_d.subset(kk), flatten=kk)
+
+        _d_show_as.update(_d_remainder)
+
+        if op.star:
+            return _d_show_as.merge(_d)
+
+        return _d_show_as
+
+    def process_trans(self, dset, _d, exp_only):
+        for key, trs in list(self.op.transforms.items()):
+            if key in _d:
+                _d[key] = dset.tcast(key, _d.get(key), trs)
+        return _d
+
+    def process_flats(self, dset, _d, exp_only):
+        for fld, keep in self.op.flats.items():
+            _d = _d.flat([fld], keep_lists=keep)
+
+        return _d
+
+    def process_unflats(self, dset, _d, exp_only):
+        return _d.unflat(self.op.unflats)
+
+    def process_defaults(self, dset, _d, exp_only):
+        return _d.update_with(self.defaults, overwrite=False)
+
+    def process_envelope(self, dset, _d, exp_only):
+        return slovar({self.op.envelope:_d})
+
+
+def _simple_columns(op):
+    # (column, key, transforms) when every field is a plain top level key,
+    # possibly renamed. None if the spec needs the full `Extractor`.
+    if op.star or op.exclude or op.flats or op.unflats or op.assignments \
+            or op.envelope:
+        return None
+
+    columns = {}
+    counts = collections.Counter(op.exp_only)
+    for fld in op.exp_only:
+        if '*' in fld or '.' in fld:
+            return None
+
+        if fld in op.show_as and len(op.show_as[fld]) != counts[fld]:
+            return None
+
+        for name in op.show_as.get(fld, [fld]):
+            columns[name] = (fld, op.transforms.get(name))
+
+    return [(name, fld, trs) for name, (fld, trs) in columns.items()]
+
+
+def _typed_column(values, trs, numpy):
+    typecode = {'int': 'q', 'float': 'd'}.get(trs[-1] if trs else None)
+    if not typecode:
+        return values
+
+    try:
+        if numpy:
+            return numpy.array(values, dtype=int if typecode == 'q' else float)
+        return array(typecode, values)
+    except (TypeError, ValueError, OverflowError):
+        # Nones or mixed values, leave it as a list
+        return values
+
+
+def extract_columns(iterable, fields, defaults=None, typed=False):
+    """Columnar `to_dicts`: returns {column: [values]} with one value per
+    record, None where the record has no such field.
+
+    With `typed=True` columns ending with `:int`/`:float` transforms are
+    returned as `array.array`, with `typed='numpy'` as numpy arrays.
+    """
+    numpy = None
+    if typed == 'numpy':
+        import numpy
+
+    op = compile_fields(fields)
+    columns = _simple_columns(op) if not defaults else None
+
+    if columns is not None:
+        data = {name: [] for name, _, _ in columns}
+
+        # raw values first, then each column is typecast in one go
+        for rec in iterable:
+            for name, fld, trs in columns:
+                val = rec.get(fld, _MISSING if trs else None)
+                if val is None and trs and not TCAST_NONE:
+                    val = _MISSING
+                data[name].append(val)
+
+        error_klass = slovar().bad_value_error_klass
+        for name, _, trs in columns:
+            if trs:
+                data[name] = tcast_column(data[name], trs, key=name, error_klass=error_klass,
+                                          skip=_MISSING, numpy=numpy)
+
+        if typed:
+            for name, _, trs in columns:
+                data[name] = _typed_column(data[name], trs, numpy)
+
+        return data
+
+    _extract = Extractor(op, defaults)
+    data = {}
+    nrows = 0
+    for rec in iterable:
+        row = _extract(rec)
+        for kk, vv in row.items():
+            if kk not in data:
+                data[kk] = [None] * nrows
+            data[kk].append(vv)
+        nrows += 1
+        for col in data.values():
+            if len(col) < nrows:
+                col.append(None)
+
+    if typed:
+        for kk in data:
+            data[kk] = _typed_column(data[kk], op.transforms.get(kk), numpy)
+
+    return data
+
+
+class Updater(object):
+    """Reusable `slovar.update_with` recipe.
+
+    List operation params, flattening and overwrite rules are parsed once
+    and then applied to any number of `(target, patch)` pairs.
+    """
+
+    def __init__(self, overwrite=True, append_to=None, append_to_set=None,
+                       flatten=None, merge_to=None, remove_from=None,
+                       inplace=False, errors=None):
+
+        self.errors = slovar() if errors is None else errors
+        self.flatten = flatten
+        self.inplace = inplace
+        self.flat_keys = flatten if isinstance(flatten, list) else None
+
+        self.append_to = self.process_append_to_param(append_to)
+        self.append_to_set = self.process_append_to_param(append_to_set)
+        self.merge_to = self.process_append_to_param(merge_to)
+        self.remove_from = self.process_append_to_param(remove_from)
+
+        self.flat_overwrites = ()
+        if flatten and self.flat_keys and isinstance(overwrite, list):
+            s_overwrites = set(overwrite)
+            flat_overwrites = (set(self.flat_keys) & s_overwrites)
+            overwrite = list(s_overwrites - flat_overwrites)
+            self.flat_overwrites = tuple('%s.' % it for it in flat_overwrites)
+
+        self.overwrite = overwrite
+        if isinstance(overwrite, list):
+            self.overwrite_keys = set(overwrite)
+
+    def process_append_to_param(self, _lst):
+        flatten = self.flatten
+
+        if isinstance(_lst, str):
+            _lst = [_lst]
+
+        if not _lst:
+            return {}
+
+        _d = {}
+        for each in (_lst or []):
+            k,_,sk = each.partition(':')
+            _d[k]=sk
+
+            #reference to nested field?
+            if '.' in k and (not flatten or (isinstance(flatten, list) and k.split('.')[0] not in flatten)):
+                raise self.errors.bad_value_error_klass(
+                    'list operation referrers to nested field `%s` without flattening.'
+                    ' forgot to pass `flatten=%s`?' % (k, k.split('.')[0]))
+        return _d
+
+    def can_overwrite(self, key):
+        overwrite = self.overwrite
+
+        if overwrite == True:
+            return True
+
+        if isinstance(overwrite, list):
+            if self.flatten == True:
+                return True
+
+            if self.flat_overwrites and key.startswith(self.flat_overwrites):
+                return True
+
+            if key in self.overwrite_keys:
+                return True
+
+        return False
+
+    def __call__(self, target, patch):
+        if not isinstance(target, slovar):
+            if self.inplace:
+                # update a slovar copy, then write it back to the caller's mapping
+                result = self(slovar(target), patch)
+                target.clear()
+                target.update(result)
+                return target
+            target = slovar(target)
+
+        self_dict = target if self.inplace else target.copy()
+        if not patch:
+            return self_dict
+
+        if not isinstance(patch, slovar):
+            patch = slovar(patch)
+
+        flatten = self.flatten
+        flat_keys = self.flat_keys
+
+        if flatten:
+            if self.inplace and flat_keys:
+                # only the named branches get flattened, the rest stays put
+                self_dict.flat_keys(flat_keys, inplace=True)
+            else:
+                self_dict = self_dict.flat(keys=flat_keys)
+            patch = patch.flat(keys=flat_keys)
+
+        for key, val in list(patch.items()):
+
+            if key in self.append_to:
+                self_dict[key] = self._append_to(target, self_dict, key, val)
+            elif key in self.append_to_set:
+                self_dict[key] = self._append_to_set(target, self_dict, key, val)
+            elif key in self.merge_to:
+                self_dict[key] = self._merge_to(target, self_dict, key, val)
+            elif key in self.remove_from:
+                self_dict[key] = self._remove_from(target, self_dict, key, val)
+            elif key not in self_dict:
+                self_dict[key] = val
+            elif self.overwrite and self.can_overwrite(key):
+                self_dict[key] = val
+
+        if flatten:
+            if not self.inplace:
+                self_dict = self_dict.unflat()
+
+            elif flat_keys:
+                # a flatten key naming a leaf is flattened to that very key
+                names = set(flat_keys)
+                prefixes = tuple('%s.' % it for it in flat_keys)
+                branches = slovar()
+                for kk in [kk for kk in self_dict if isinstance(kk, str)
+                                    and (kk in names or kk.startswith(prefixes))]:
+                    branches[kk] = self_dict.pop(kk)
+                self_dict.merge(branches.unflat())
+
+            else:
+                unflat_dict = self_dict.unflat()
+                dict.clear(target)
+                self_dict = target.update(unflat_dict)
+
+        return self_dict
+
+    def apply(self, pairs):
+        for target, patch in pairs:
+            yield self(target, patch)
+
+    def map(self, pairs, workers=None, backend=None, **kw):
+        # with `backend` ('process' or 'thread') runs through `parallel_map`
+        if not backend:
+            return list(self.apply(pairs))
+
+        return parallel_map(pairs, op='update_with', workers=workers,
+                            backend=backend, updater=self, **kw)
+
+    @staticmethod
+    def _build_list(dset, key, _lst, new_val):
+        if isinstance(_lst, list):
+            if isinstance(new_val, list):
+                _lst.extend(new_val)
+            else:
+                _lst.append(new_val)
+        else:
+            raise dset.bad_value_error_klass('`%s` is not a list' % key)
+
+        return _lst
+
+    def _append_to(self, dset, self_dict, key, val):
+        _lst = self._build_list(dset, key, self_dict.get(key, []), val)
+        sort_key = self.append_to.get(key)
+        sort_method = None
+        reverse = False
+
+        if sort_key:
+            if sort_key.startswith('-'):
+                sort_key = sort_key[1:]
+                reverse = True
+            elif sort_key.startswith('+'):
+                sort_key = sort_key[1:]
+
+            if sort_key:
+                sort_method = lambda x: x.get(sort_key)
+
+            _lst = sorted(_lst, key=sort_method, reverse=reverse)
+
+        return _lst
+
+    def _append_to_set(self, dset, self_dict, key, val):
+        new_lst = self._build_list(dset, key, self_dict.get(key, []), val)
+        set_key = self.append_to_set.get(key)
+
+        if set_key.startswith('-'):
+            reverse_order = True
+            set_key = set_key[1:]
+        else:
+            reverse_order = False
+
+        #ie append_to_set=people:full_name. `full_name` is a set_key
+        #this will mean make people unique for inner field `full_name`
+        if set_key:
+            _uniques = []
+            _met = ValueIndex()
+            _not_found = []
+
+            #reverse the list so new values overwrite old ones,
+            #since it was appended at the end
+            for each in reversed(new_lst):
+                if not each:
+                    log.debug('Empty item in the `%s:%s` list.Skip.', key, set_key)
+                    continue
+
+                if set_key not in each:
+                    _not_found.append(each)
+                    continue
+
+                if each[set_key] in _met:
+                    continue
+
+                _met.add(each[set_key])
+                _uniques.append(each)
+
+            new_lst = sorted(_uniques, key= lambda x: x.get(set_key), reverse=reverse_order)
+            new_lst.extend(_not_found)
+        else:
+            try:
+                new_lst = list(set(new_lst))
+            except TypeError as e:
+                raise dset.bad_value_error_klass('items in `%s` list not hashable. missed the set_key ?'\
+                                 % (key))
+
+        return new_lst
+
+    def _merge_to(self, dset, self_dict, key, val):
+        set_key = self.merge_to.get(key)
+        new_lst = []
+
+        if not set_key:
+            raise dset.bad_value_error_klass('merge_to must contain a set key')
+
+        if not isinstance(val, list):
+            val = [val]
+
+        # built on the first keyed item, so patch items are only looked
+        # into when there is something to merge them with
+        incoming = None
+
+        for each in self_dict.get(key, []):
+            if each.get(set_key):
+                if incoming is None:
+                    incoming = ValueIndex()
+                    for it in val:
+                        if it.get(set_key):
+                            incoming.add(it[set_key], it)
+
+                for it in incoming.get(each[set_key], []):
+                    each = each.update_with(it)
+
+            new_lst.append(each)
+
+        return new_lst
+
+    def _remove_from(self, dset, self_dict, key, val):
+        set_key = self.remove_from.get(key)
+        new_lst = self_dict.get(key, [])
+        removed = ValueIndex()
+
+        if set_key:
+            not_dict = [it for it in new_lst if not isinstance(it, dict)]
+            for vv in val:
+                if new_lst and (not isinstance(vv, dict) or not_dict):
+                    raise dset.bad_value_error_klass(
+                        'set key `%s` can be specified only for dicts. Got : `%s` and `%s`' % (
+                                set_key, vv, new_lst[0] if not isinstance(vv, dict) else not_dict[0]))
+
+                if set_key in vv:
+                    removed.add(vv[set_key])
+
+            return [vvv for vvv in new_lst if vvv.get(set_key, None) not in removed]
+
+        for vv in val:
+            removed.add(vv)
+
+        return [vvv for vvv in new_lst if vvv not in removed]
+
+
+class _Values(object):
+    # `in` over a set when the values are hashable, over the list otherwise
+
+    __slots__ = ('values', 'lookup')
+
+    def __init__(self, values):
+        self.values = values
+        try:
+            self.lookup = frozenset(values)
+        except TypeError:
+            self.lookup = None
+
+    def __contains__(self, val):
+        if self.lookup is not None:
+            try:
+                return val in self.lookup
+            except TypeError:
+                pass
+        return val in self.values
+
+    def __bool__(self):
+        return bool(self.values)
+
+
+class _Rule(object):
+
+    __slots__ = ('path', 'type', 'allowed', 'forbidden', 'required', 'err')
+
+    def __init__(self, path, type=str, allowed=[], forbidden=[], required=True, err=''):
+        self.path = path
+        self.type = type
+        self.allowed = _Values(allowed)
+        self.forbidden = _Values(forbidden)
+        self.required = required
+        self.err = err
+
+    def missing_error(self):
+        if self.type == dict:
+            missing = ['%s.%s' % (self.path, val) for val in self.allowed.values]
+        else:
+            missing = self.allowed.values
+
+        return 'Missing key or invalid values for `%s`. Allowed values are: `%s`'\
+                                      % (self.path, missing)
+
+    def error(self, code, msg):
+        if "%s" in self.err:
+            msg = self.err % msg
+        elif self.err:
+            msg = self.err
+
+        return {'path': self.path, 'code': code, 'message': msg}
+
+    def check(self, val):
+        if val is _MISSING:
+            if not self.required:
+                return
+            elif self.allowed:
+                yield self.error('missing', self.missing_error())
+            else:
+                yield self.error('missing', 'Missing key: `%s`' % self.path)
+            return
+
+        if self.type and not isinstance(val, self.type):
+            yield self.error('type', '`%s` must be type `%s`, got `%s` instead'\
+                                      % (self.path, self.type.__name__, type(val).__name__))
+
+        if self.allowed and val not in self.allowed:
+            yield self.error('allowed', self.missing_error())
+
+        if val in self.forbidden:
+            yield self.error('forbidden', '`%s`=`%s` value is not allowed' % (self.path, val))
+
+
+def _has_value(dset, key):
+    # high level keys first, then dotted paths as in `dset.flat()`
+    if key in dset:
+        return dset[key]
+    return flat_get(dset, key, _MISSING)
+
+
+class Validator(object):
+    """Reusable `slovar.has` check.
+
+    `schema` maps dotted paths (or is a list of `(path, rules)` pairs) to
+    a type or to a dict with `type`, `allowed`, `forbidden`, `required`
+    and `err` keys, same meaning as the `has` arguments. Allowed and
+    forbidden values are kept in sets.
+    """
+
+    def __init__(self, schema, _all=True, errors=None):
+        self.errors = slovar() if errors is None else errors
+        self._all = _all
+
+        if isinstance(schema, dict):
+            schema = schema.items()
+
+        self.rules = []
+        for path, rules in schema:
+            if not isinstance(rules, dict):
+                rules = dict(type=rules)
+            self.rules.append(_Rule(path, **rules))
+
+    def check(self, dset):
+        """Returns list of `{'path', 'code', 'message'}` errors, empty if
+        `dset` is valid. `code` is one of missing, type, allowed or forbidden.
+        """
+        errors = []
+        for rule in self.rules:
+            errors.extend(rule.check(_has_value(dset, rule.path)))
+        return errors
+
+    def check_many(self, iterable):
+        """Returns `(index, errors)` for every invalid record in `iterable`"""
+        result = []
+        for ix, dset in enumerate(iterable):
+            errors = self.check(dset)
+            if errors:
+                result.append((ix, errors))
+        return result
+
+    def __call__(self, dset):
+        errors = self.check(dset)
+
+        if (errors and self._all) or (not self._all and len(errors) >= len(self.rules)):
+            raise self.errors.bad_value_error_klass('.'.join(it['message'] for it in errors))
+
+        return True
+
+
+@lru_cache(maxsize=FIELD_PLAN_CACHE_SIZE)
+def _cached_extractor(op):
+    return Extractor(op)
+
+
+compile_extract = slovar.compile_extract
+iter_extract = slovar.iter_extract
+compile_update = slovar.compile_update
+compile_has = slovar.compile_has
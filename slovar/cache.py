@@ -0,0 +1,118 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+from slovar.fingerprint import fingerprint
+
+
+def sizeof(obj):
+    # rough recursive size in bytes, good enough for cache accounting
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(sizeof(kk) + sizeof(vv) for kk, vv in dict.items(obj))
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(sizeof(it) for it in obj)
+    return size
+
+
+class ExtractCache(object):
+    """LRU cache for `slovar.extract` results keyed by a caller supplied
+    document key (ie id and version) and the normalized field spec.
+    Lookups without a key are not cached, the caller has to make sure the
+    key changes whenever the document does.
+
+    `maxsize` bounds the number of entries, `max_bytes` their estimated
+    size and `ttl` (seconds) their age. Specs with `__NOW__`, `__TODAY__`
+    or `__OID__` assignments are never cached.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, max_bytes=None, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.timer = timer
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.skips = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, skips=self.skips,
+                    evictions=self.evictions, entries=len(self._data), size=self.size)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            result, size, expires = entry
+            if expires is not None and expires <= self.timer():
+                self._evict(key)
+                return None
+
+            self._data.move_to_end(key)
+            return result
+
+    def _evict(self, key):
+        _, size, _ = self._data.pop(key)
+        self.size -= size
+        self.evictions += 1
+
+    def _set(self, key, result):
+        size = sizeof(result) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        expires = self.timer() + self.ttl if self.ttl else None
+
+        with self._lock:
+            if key in self._data:
+                self._evict(key)
+
+            self._data[key] = (result, size, expires)
+            self.size += size
+
+            while self._data and (len(self._data) > self.maxsize or
+                                  (self.max_bytes and self.size > self.max_bytes)):
+                self._evict(next(iter(self._data)))
+
+    def extract(self, dset, fields, defaults=None, key=None):
+        from slovar import slovar, compile_fields, _cached_extractor, Extractor
+
+        op = compile_fields(fields)
+        extractor = Extractor(op, defaults) if defaults else _cached_extractor(op)
+
+        if key is None or not extractor.cacheable:
+            self.skips += 1
+            return extractor(dset)
+
+        key = (key, op.fields, fingerprint(defaults) if defaults else None)
+
+        result = self._get(key)
+        if result is not None:
+            self.hits += 1
+            # callers get their own copy, the cached one stays untouched
+            return result.deepcopy()
+
+        self.misses += 1
+        result = extractor(dset)
+        if isinstance(result, slovar):
+            # result may share values with `dset`, cache a detached copy
+            self._set(key, result.deepcopy())
+
+        return result
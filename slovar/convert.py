@@ -1,65 +1,131 @@
+import re
 import six
+from functools import lru_cache
+from collections.abc import Sequence
 from urllib.parse import parse_qsl
 
 from slovar.strings import split_strip, str2dt, str2rdt
+from slovar.dictionaries import unflat, compile_path, Path
 
 
-def parametrize(func):
+TRUTHY = frozenset(('t', 'true', 'y', 'yes', 'on', '1'))
+FALSEY = frozenset(('f', 'false', 'n', 'no', 'off', '0'))
 
-    def wrapper(dset, name, default=None, raise_on_values=None, pop=False,
-                            allow_missing=False, set_as=None, pop_empty=False,
-                            _raise=True, mod=None, **kw):
 
-        if pop_empty:
-            allow_missing = True
+# returned by `_convert` when nothing was converted
+SKIPPED = object()
 
-        if default is None:
-            try:
-                value = dset[name]
-            except KeyError:
-                if not allow_missing:
-                    raise KeyError("Missing '%s'" % name)
-                else:
-                    return
-        else:
-            value = dset.get(name, default)
 
-        if pop_empty and not value:
-            dset.pop(name, None)
-            return
+def _values(values):
+    # set for fast `in` checks when possible
+    try:
+        return frozenset(values)
+    except TypeError:
+        return values
 
-        if raise_on_values and value in raise_on_values:
-            raise ValueError("'%s' can not be any of %s" % (name, raise_on_values))
 
+def _convert(func, dset, name, default, raise_on_values, forbidden, pop,
+             allow_missing, set_as, pop_empty, _raise, mod, kw):
+
+    if pop_empty:
+        allow_missing = True
+
+    if default is None:
         try:
-            result = func(dset, value, **kw)
-        except Exception:
-            if _raise:
-                import sys
-                raise ValueError(sys.exc_info()[1])
+            value = dset[name]
+        except KeyError:
+            if not allow_missing:
+                raise KeyError("Missing '%s'" % name)
             else:
-                return
+                return SKIPPED
+    else:
+        value = dset.get(name, default)
 
-        if mod:
-            result = mod(result)
+    if pop_empty and not value:
+        dset.pop(name, None)
+        return SKIPPED
+
+    if forbidden:
+        try:
+            is_forbidden = value in forbidden
+        except TypeError:
+            is_forbidden = value in raise_on_values
+        if is_forbidden:
+            raise ValueError("'%s' can not be any of %s" % (name, raise_on_values))
 
-        if pop:
-            dset.pop(name, None)
-            if set_as:
-                dset[set_as] = result
+    try:
+        result = func(dset, value, **kw)
+    except Exception:
+        if _raise:
+            import sys
+            raise ValueError(sys.exc_info()[1])
         else:
-            dset[set_as or name] = result
+            return SKIPPED
+
+    if mod:
+        result = mod(result)
+
+    if pop:
+        dset.pop(name, None)
+        if set_as:
+            dset[set_as] = result
+    else:
+        dset[set_as or name] = result
+
+    return result
 
-        return result
 
+def parametrize(func):
+
+    def wrapper(dset, name, default=None, raise_on_values=None, pop=False,
+                            allow_missing=False, set_as=None, pop_empty=False,
+                            _raise=True, mod=None, **kw):
+
+        result = _convert(func, dset, name, default, raise_on_values, raise_on_values, pop,
+                          allow_missing, set_as, pop_empty, _raise, mod, kw)
+        return None if result is SKIPPED else result
+
+    wrapper.func = func
     return wrapper
 
 
+class Param(object):
+    """One `as*` conversion with its `parametrize` options resolved once,
+    `raise_on_values` as a set. Used by `Schema`.
+    """
+
+    __slots__ = ('func', 'name', 'default', 'raise_on_values', 'forbidden', 'pop',
+                 'allow_missing', 'set_as', 'pop_empty', '_raise', 'mod', 'kw')
+
+    def __init__(self, func, name, default=None, raise_on_values=None, pop=False,
+                            allow_missing=False, set_as=None, pop_empty=False,
+                            _raise=True, mod=None, **kw):
+        self.func = getattr(func, 'func', func)
+        self.name = name
+        self.default = default
+        self.raise_on_values = raise_on_values
+        self.forbidden = _values(raise_on_values) if raise_on_values else None
+        self.pop = pop
+        self.allow_missing = allow_missing
+        self.set_as = set_as
+        self.pop_empty = pop_empty
+        self._raise = _raise
+        self.mod = mod
+        self.kw = kw
+
+    def apply(self, dset):
+        # converted value or SKIPPED
+        return _convert(self.func, dset, self.name, self.default, self.raise_on_values,
+                        self.forbidden, self.pop, self.allow_missing, self.set_as,
+                        self.pop_empty, self._raise, self.mod, self.kw)
+
+    def __call__(self, dset):
+        result = self.apply(dset)
+        return None if result is SKIPPED else result
+
+
 @parametrize
 def asbool(dset, value):
-    truthy = frozenset(('t', 'true', 'y', 'yes', 'on', '1'))
-    falsey = frozenset(('f', 'false', 'n', 'no', 'off', '0'))
-
     if value is None:
         return False
 
@@ -67,9 +133,9 @@ def asbool(dset, value):
         return value
 
     lvalue = str(value).strip().lower()
-    if lvalue in truthy:
+    if lvalue in TRUTHY:
         return True
-    elif lvalue in falsey:
+    elif lvalue in FALSEY:
         return False
     else:
         raise ValueError(
@@ -101,6 +167,10 @@ def asset(*args, **kw):
     return set(aslist(*args, **kw))
 
 
+def _asset(dset, value, **kw):
+    return set(aslist.func(dset, value, **kw))
+
+
 @parametrize
 def asint(dset, value):
     return int(value)
@@ -121,15 +191,67 @@ def asunicode(dset, value):
     return str(value)
 
 
+class RangeView(Sequence):
+    """Lazy `asrange` result: a `range` with `typecast` applied to items
+    on access. Supports `len`, indexing and slicing (which give views
+    too); `bounds` returns the first and last item for db range queries.
+    """
+
+    __slots__ = ('range', 'typecast')
+
+    def __init__(self, range_, typecast=str):
+        self.range = range_
+        self.typecast = typecast
+
+    def __len__(self):
+        return len(self.range)
+
+    def __getitem__(self, ix):
+        if isinstance(ix, slice):
+            return RangeView(self.range[ix], self.typecast)
+        return self.typecast(self.range[ix])
+
+    def __iter__(self):
+        return map(self.typecast, self.range)
+
+    def __contains__(self, val):
+        if self.typecast is int:
+            return isinstance(val, int) and val in self.range
+        try:
+            num = int(val)
+        except (TypeError, ValueError):
+            return False
+        return num in self.range and self.typecast(num) == val
+
+    def __eq__(self, other):
+        if isinstance(other, RangeView):
+            return self.range == other.range and self.typecast == other.typecast
+        if isinstance(other, list):
+            return len(self) == len(other) and list(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return 'RangeView(%r, %s)' % (self.range, getattr(self.typecast, '__name__', self.typecast))
+
+    @property
+    def bounds(self):
+        # (first, last) item, both inclusive, None for an empty range
+        if not self.range:
+            return None
+        return self[0], self[-1]
+
+
 @parametrize
-def asrange(dset, value, typecast=str, sep='-'):
+def asrange(dset, value, typecast=str, sep='-', lazy=False):
     if isinstance(value, list):
         list_ = value
     elif isinstance(value, str):
         rng = split_strip(value, sep)
         if len(rng) != 2:
             raise ValueError('bad range')
-        list_ = list(range(int(rng[0]), int(rng[1])+1))
+        list_ = range(int(rng[0]), int(rng[1])+1)
+        if lazy:
+            return RangeView(list_, typecast)
 
     else:
         list_ = [value]
@@ -179,16 +301,184 @@ def asdt(dset, value):
     return str2dt(value)
 
 
-def qs2dict(qs):
+QS_CACHE_SIZE = 256
+# digit parts above this stay dict keys instead of list indexes
+QS_LIST_LIMIT = 100
+
+BRACKETS_RE = re.compile(r'\[([^\]]*)\]')
+
+
+@lru_cache(maxsize=QS_CACHE_SIZE)
+def _parse_qs(qs):
+    # ((dotted key, values, forced list), ...) with bracket keys turned
+    # into dotted ones: `a[b][]=1&a[b][]=2` -> (('a.b', ('1', '2'), True),)
+    parsed = {}
+
+    for key, val in parse_qsl(qs, keep_blank_values=True):
+        as_list = False
+
+        head, bracket, rest = key.partition('[')
+        if bracket:
+            parts = BRACKETS_RE.findall(bracket + rest)
+            if parts and parts[-1] == '':
+                parts.pop()
+                as_list = True
+            key = '.'.join([head] + parts)
+
+        if key in parsed:
+            parsed[key][0].append(val)
+            parsed[key][1] = parsed[key][1] or as_list
+        else:
+            parsed[key] = [[val], as_list]
+
+    return tuple((key, tuple(vals), as_list) for key, (vals, as_list) in parsed.items())
+
+
+def _qs_path(key):
+    # `a[2000000]=1` must not allocate a list of two million items
+    path = compile_path(key)
+    if any(ix is not None and ix > QS_LIST_LIMIT for ix in path.indexes):
+        path = Path(key)
+        path.indexes = tuple(None if ix is not None and ix > QS_LIST_LIMIT else ix
+                                                    for ix in path.indexes)
+    return path
+
+
+def _hint(hint, value):
+    # `hint` is a CONVERTERS name, an `as*` converter or a plain `func(value)`
+    if isinstance(hint, str):
+        hint = CONVERTERS[hint]
+
+    if hint is _asset or hasattr(hint, 'func'):
+        convert = getattr(hint, 'func', hint)
+        if convert in (aslist.func, _asset):
+            return convert(None, value)
+        func = lambda val: convert(None, val)
+    else:
+        func = hint
+
+    if isinstance(value, list):
+        return [func(it) for it in value]
+    return func(value)
+
+
+def decode_qs(qs, hints=None):
+    """Parses `qs` into a nested slovar. Dotted (`a.b=1`) and bracket
+    (`a[b]=1`) keys become nested dicts, digit parts up to `QS_LIST_LIMIT`
+    list indexes, repeated keys and `a[]=` keys lists. `hints` maps dotted keys to a
+    `CONVERTERS` name or converter to apply to their values.
+    Parsed query strings are cached.
+    """
     from slovar import slovar
+
+    flat = {}
+    for key, vals, as_list in _parse_qs(qs):
+        value = list(vals) if as_list or len(vals) > 1 else vals[0]
+        if hints and key in hints:
+            value = _hint(hints[key], value)
+        flat[_qs_path(key)] = value
+
+    try:
+        return slovar(unflat(flat))
+    except (TypeError, AttributeError, IndexError):
+        raise ValueError('conflicting keys in query string `%s`' % qs)
+
+
+def qs2dict(qs, nested=False, hints=None):
+    from slovar import slovar
+
+    if nested or hints:
+        return decode_qs(qs, hints=hints)
     return slovar(parse_qsl(qs, keep_blank_values=True))
 
 
 @parametrize
-def asqs(dset, value):
-    return qs2dict(value)
+def asqs(dset, value, nested=False, hints=None):
+    return qs2dict(value, nested=nested, hints=hints)
 
 from bson import ObjectId
 @parametrize
 def asdtob(dset, value):
     return str(ObjectId.from_datetime(str2dt(value)))
+
+
+CONVERTERS = {
+    'bool': asbool,
+    'list': aslist,
+    'set': _asset,
+    'int': asint,
+    'float': asfloat,
+    'str': asstr,
+    'unicode': asunicode,
+    'range': asrange,
+    'dt': asdt,
+    'qs': asqs,
+    'dtob': asdtob,
+}
+
+
+class Schema(object):
+    """Declarative `as*` conversion of many parameters in one pass:
+
+        schema = Schema({
+            'page': dict(type='int', default=1),
+            'fields': dict(type='list', pop=True, set_as='_fields'),
+            'debug': 'bool',
+        })
+        schema(params)
+
+    `type` is a `CONVERTERS` name or a `func(dset, value, **kw)`, other
+    keys are the `parametrize` options (default, pop, set_as, mod,
+    raise_on_values, ...) and converter keyword args. Params are
+    converted in `dset` in place, all errors are collected and raised
+    together as one ValueError.
+    """
+
+    def __init__(self, params):
+        if isinstance(params, dict):
+            params = params.items()
+
+        self.params = []
+        for name, spec in params:
+            if not isinstance(spec, dict):
+                spec = dict(type=spec)
+            else:
+                spec = dict(spec)
+
+            func = spec.pop('type', 'str')
+            if isinstance(func, str):
+                try:
+                    func = CONVERTERS[func]
+                except KeyError:
+                    raise ValueError('unknown type `%s` for `%s`. must be one of %s'
+                                        % (func, name, sorted(CONVERTERS)))
+
+            self.params.append(Param(func, name, **spec))
+
+    def parse(self, dset):
+        """Returns `(result, errors)`: converted values and error messages,
+        both keyed by param name.
+        """
+        result = {}
+        errors = {}
+
+        for param in self.params:
+            try:
+                value = param.apply(dset)
+            except KeyError as e:
+                errors[param.name] = e.args[0]
+                continue
+            except ValueError as e:
+                errors[param.name] = str(e)
+                continue
+
+            if value is not SKIPPED:
+                result[param.set_as or param.name] = value
+
+        return result, errors
+
+    def __call__(self, dset):
+        result, errors = self.parse(dset)
+        if errors:
+            raise ValueError('; '.join(errors.values()))
+        return result
@@ -1,6 +1,40 @@
 import logging
+from functools import lru_cache
+
 log = logging.getLogger(__name__)
 
+PATH_CACHE_SIZE = 4096
+
+
+class Path(object):
+    """Pre-split dotted path. `indexes` holds the int value of digit
+    segments (for list access) and None for the rest.
+    """
+
+    __slots__ = ('path', 'keys', 'indexes')
+
+    def __init__(self, path, sep='.'):
+        self.path = path
+        self.keys = tuple(path.split(sep))
+        self.indexes = tuple(int(kk) if kk.isdigit() else None for kk in self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return 'Path(%r)' % self.path
+
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def _compile_path(path):
+    return Path(path)
+
+
+def compile_path(path):
+    if isinstance(path, Path):
+        return path
+    return _compile_path(path)
+
 
 def _extend_list(_list, length):
     if len(_list) < length:
@@ -10,71 +44,98 @@ def _extend_list(_list, length):
 
 def unflat(_dict, only=[], sep='.'):
     result = {}
+    only = tuple(only)
 
     for dotted_path, leaf_value in list(_dict.items()):
-        if only and not [it for it in only if dotted_path.startswith(it)]:
+        if only and not dotted_path.startswith(only):
             result[dotted_path]=leaf_value
             continue
 
-        path = dotted_path.split(sep)
+        path = compile_path(dotted_path) if sep == '.' else Path(dotted_path, sep)
+        keys = path.keys
+        indexes = path.indexes
         ctx = result
+
         # Last item is a leaf, we save time by doing it outside the loop
-        for i, part in enumerate(path[:-1]):
-            # If context is a list, part should be an int
-            # Testing part.isdigit() is significantly faster than isinstance(ctx, list)
-            ctx_is_list = part.isdigit()
-            if ctx_is_list:
-                part = int(part)
+        for i in range(len(keys) - 1):
+            ix = indexes[i]
             # If the next part is an int, we need to contain a list
-            ctx_contains_list = path[i+1].isdigit()
+            contains_list = indexes[i+1] is not None
+
+            if ix is None:
+                # Set the current node to placeholder value, {} or []
+                node = ctx.get(keys[i])
+                if not node:
+                    node = [] if contains_list else {}
+                    ctx[keys[i]] = node
+            else:
+                # If we're dealing with a list, make sure it's big enough
+                # for part to be in range
+                _extend_list(ctx, ix + 1)
+                node = ctx[ix]
+                # If we're empty and contain a list
+                if not node and contains_list:
+                    node = []
+                    ctx[ix] = node
+
+            ctx = node
+
+        leaf_ix = indexes[-1]
+        if leaf_ix is not None:
+            _extend_list(ctx, leaf_ix + 1)
+            ctx[leaf_ix] = leaf_value
+        else:
+            ctx[keys[-1]] = leaf_value
+
+    return result
 
-            # Set the current node to placeholder value, {} or []
-            if not ctx_is_list and not ctx.get(part):
-                ctx[part] = [] if ctx_contains_list else {}
 
-            # If we're dealing with a list, make sure it's big enough
-            # for part to be in range
-            if ctx_is_list:
-                _extend_list(ctx, part + 1)
+def _iter_items(value):
+    return iter(value.items()) if isinstance(value, dict) else enumerate(value)
 
-            # If we're empty and contain a list
-            if not ctx[part] and ctx_contains_list:
-                ctx[part] = []
 
-            ctx = ctx[part]
+def iter_flat(_dict, base_key='', keep_lists=True, sep='.'):
+    # same as `flat`, yields (dotted_key, value) pairs instead of building a dict
+    stack = [(base_key, _iter_items(_dict))]
 
-        leaf_key = path[-1]
-        if leaf_key.isdigit():
-            leaf_key = int(leaf_key)
-            _extend_list(ctx, leaf_key + 1)
+    while stack:
+        prefix, items = stack[-1]
 
-        ctx[leaf_key] = leaf_value
+        for key, value in items:
+            # Join keys but prevent keys from starting by `sep`
+            dotted_key = prefix + sep + str(key) if prefix else key
 
-    return result
+            # Go deeper if we find a dict or list, except if we're keeping lists
+            if value and (isinstance(value, dict) or (isinstance(value, list) and not keep_lists)):
+                stack.append((dotted_key, _iter_items(value)))
+                break
+
+            yield dotted_key, value
+        else:
+            stack.pop()
 
 
 def flat(_dict, base_key='', keep_lists=False, sep='.'):
     result = {}
+    stack = [(base_key, _iter_items(_dict))]
+
     try:
-        if isinstance(_dict, dict):
-            iterable = _dict
-        else:
-            #turn the nested list in to a dict of <index, item>
-            iterable = dict(enumerate(_dict))
+        while stack:
+            prefix, items = stack[-1]
 
-        for key, value in list(iterable.items()):
-            # Join keys but prevent keys from starting by `sep`
-            if not base_key:
-                dotted_key = key
-            else:
-                dotted_key = sep.join([base_key, str(key)])
+            for key, value in items:
+                # Join keys but prevent keys from starting by `sep`
+                dotted_key = prefix + sep + str(key) if prefix else key
+
+                # Go deeper if we find a dict or list, except if we're keeping lists
+                if value and (isinstance(value, dict) or (isinstance(value, list) and not keep_lists)):
+                    stack.append((dotted_key, _iter_items(value)))
+                    break
 
-            # Recursion if we find a dict or list, except if we're keeping lists
-            if value and (isinstance(value, dict) or (isinstance(value, list) and not keep_lists)):
-                result.update(flat(value, base_key=dotted_key, keep_lists=keep_lists, sep=sep))
-            else:
                 # Otherwise just set attribute
                 result[dotted_key] = value
+            else:
+                stack.pop()
     except:
         log.error('Problems calling flat on:\n%s' % _dict)
         raise
@@ -82,6 +143,48 @@ def flat(_dict, base_key='', keep_lists=False, sep='.'):
     return result
 
 
+_NOTHING = object()
+
+
+def _flat_children(node, key, top):
+    if key in node:
+        yield node[key]
+    if not top and key.isdigit() and int(key) in node:
+        # nested int keys show up as strings in `flat`
+        yield node[int(key)]
+
+
+def flat_get(_dict, key, default=None, sep='.'):
+    # same as `flat(_dict, keep_lists=True).get(key, default)`, but only
+    # walks the branches `key` can be in instead of flattening the whole dict
+    if not isinstance(key, str):
+        val = _dict.get(key, _NOTHING)
+        return default if val is _NOTHING or (val and isinstance(val, dict)) else val
+
+    stack = [(_dict, key)]
+    while stack:
+        node, rest = stack.pop()
+        top = node is _dict
+
+        # leaf stored under the rest of the key, dots included (`a.b` key)
+        for val in _flat_children(node, rest, top):
+            if not (val and isinstance(val, dict)):
+                return val
+
+        pos = rest.find(sep)
+        while pos != -1:
+            for child in _flat_children(node, rest[:pos], top):
+                if child and isinstance(child, dict):
+                    stack.append((child, rest[pos+len(sep):]))
+            pos = rest.find(sep, pos+1)
+
+    return default
+
+
+def flat_contains(_dict, key, sep='.'):
+    return flat_get(_dict, key, _NOTHING, sep=sep) is not _NOTHING
+
+
 def merge(d1, d2, path=None):
     if path is None:
         path = []
@@ -0,0 +1,74 @@
+import hashlib
+from datetime import date, datetime
+from bson import ObjectId
+
+DIGEST_SIZE = 16
+
+
+def _enc(tag, data):
+    return tag + str(len(data)).encode() + b':' + data
+
+
+def encode_scalar(val):
+    if val is None:
+        return b'n'
+    elif val is True:
+        return b'T'
+    elif val is False:
+        return b'F'
+    elif isinstance(val, str):
+        return _enc(b's', val.encode('utf-8', 'surrogatepass'))
+    elif isinstance(val, int):
+        return _enc(b'i', str(val).encode())
+    elif isinstance(val, float):
+        return _enc(b'f', repr(val).encode())
+    elif isinstance(val, datetime):
+        return _enc(b't', val.isoformat().encode())
+    elif isinstance(val, date):
+        return _enc(b'd', val.isoformat().encode())
+    elif isinstance(val, ObjectId):
+        return _enc(b'o', val.binary)
+    elif isinstance(val, bytes):
+        return _enc(b'y', val)
+
+    return _enc(b'x', ('%s:%s' % (type(val).__name__, val)).encode('utf-8', 'surrogatepass'))
+
+
+def _digest(obj):
+    if isinstance(obj, dict):
+        entries = []
+        for key, val in dict.items(obj):
+            if isinstance(val, (dict, list, tuple, set, frozenset)):
+                entries.append((encode_scalar(key), _enc(b'h', _digest(val))))
+            else:
+                entries.append((encode_scalar(key), encode_scalar(val)))
+
+        hasher = hashlib.blake2b(b'{', digest_size=DIGEST_SIZE)
+        for key, val in sorted(entries):
+            hasher.update(key)
+            hasher.update(val)
+        return hasher.digest()
+
+    elif isinstance(obj, (set, frozenset)):
+        hasher = hashlib.blake2b(b'<', digest_size=DIGEST_SIZE)
+        for it in sorted(_digest(it) for it in obj):
+            hasher.update(it)
+        return hasher.digest()
+
+    elif isinstance(obj, (list, tuple)):
+        hasher = hashlib.blake2b(b'[', digest_size=DIGEST_SIZE)
+        for it in obj:
+            if isinstance(it, (dict, list, tuple, set, frozenset)):
+                hasher.update(_enc(b'h', _digest(it)))
+            else:
+                hasher.update(encode_scalar(it))
+        return hasher.digest()
+
+    return hashlib.blake2b(encode_scalar(obj), digest_size=DIGEST_SIZE).digest()
+
+
+def fingerprint(obj):
+    """Deterministic content hash of a nested document, independent of key
+    order and stable across processes.
+    """
+    return _digest(obj).hex()
@@ -1,6 +1,8 @@
 import json
 from datetime import date, datetime
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -12,5 +14,99 @@ class JSONEncoder(json.JSONEncoder):
             return str(obj)  # fallback to unicode
 
 
+# encoders are stateless, one instance saves setting it up on every call
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    return _encoder.default(obj)
+
+
+def _orjson_dumps():
+    import orjson
+
+    # datetimes and dataclasses go through `_default`, same as with `json`
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS \
+                        | orjson.OPT_NON_STR_KEYS
+
+    def dumps(body):
+        try:
+            return orjson.dumps(body, default=_default, option=option).decode('utf-8')
+        except orjson.JSONEncodeError:
+            # ie ints past 64 bits, which `json` encodes fine
+            return _encoder.encode(body)
+    return dumps
+
+
+# name -> (loader of the dumps function, item separator)
+BACKENDS = {
+    'json': (lambda: _encoder.encode, ', '),
+    # compact, utf-8 output. not byte identical to `json`
+    'orjson': (_orjson_dumps, ','),
+}
+
+_backend = ('json', _encoder.encode, ', ')
+
+
+def set_json_backend(name):
+    """Selects the encoder used by `json_dumps`. `json` (the default) is
+    the stdlib encoder. `orjson` is much faster but its output is compact,
+    not ascii escaped and formats some floats differently. It also writes
+    NaN and Infinity as `null`. Bodies it can not encode at all go
+    through `json` instead.
+    """
+    global _backend
+
+    if name not in BACKENDS:
+        raise ValueError('unknown json backend `%s`. must be one of %s' % (name, sorted(BACKENDS)))
+
+    load, item_sep = BACKENDS[name]
+    _backend = (name, load(), item_sep)
+
+
+def get_json_backend():
+    return _backend[0]
+
+
 def json_dumps(body):
-    return json.dumps(body, cls=JSONEncoder)
+    return _backend[1](body)
+
+
+def _iter_chunks(body):
+    _, dumps, item_sep = _backend
+
+    if isinstance(body, dict):
+        yield '{'
+        for ix, (key, val) in enumerate(body.items()):
+            # single item dict, so keys are converted the same way
+            yield (item_sep if ix else '') + dumps({key: val})[1:-1]
+        yield '}'
+
+    elif isinstance(body, (list, tuple)) or hasattr(body, '__next__'):
+        yield '['
+        for ix, val in enumerate(body):
+            yield (item_sep if ix else '') + dumps(val)
+        yield ']'
+
+    else:
+        yield dumps(body)
+
+
+def json_dump_iter(body, fp, chunk_size=STREAM_CHUNK_SIZE):
+    """Writes `body` as json to `fp` in chunks of about `chunk_size`
+    chars, one top level item at a time instead of building the whole
+    string. Iterators (ie generators of records) are written as arrays.
+    """
+    buf = []
+    size = 0
+
+    for chunk in _iter_chunks(body):
+        buf.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            fp.write(''.join(buf))
+            buf = []
+            size = 0
+
+    if buf:
+        fp.write(''.join(buf))
@@ -1,5 +1,10 @@
+from functools import lru_cache
+from types import MappingProxyType
+
 from slovar.strings import split_strip
 
+FIELD_PLAN_CACHE_SIZE = 1024
+
 
 def expand_list(param):
     _new = []
@@ -126,6 +131,67 @@ def process_fields(fields):
              })
 
 
+class FieldPlan(object):
+    """Immutable, compiled version of `process_fields` result.
+
+    Plans are shared between calls through `compile_fields` cache, so
+    nothing in here may be mutated by `extract`/`subset`.
+    """
+
+    __slots__ = ('fields', 'only', 'exclude', 'show_as', 'show_as_r',
+                 'transforms', 'assignments', 'star', 'flats', 'unflats',
+                 'envelope', 'exp_only')
+
+    def __init__(self, op):
+        _set = super().__setattr__
+        _set('fields', tuple(op['fields']))
+        _set('only', tuple(op['only']))
+        _set('exclude', tuple(op['exclude']))
+        _set('show_as', MappingProxyType(
+                {kk: tuple(vv) for kk, vv in op['show_as'].items()}))
+        _set('show_as_r', MappingProxyType(dict(op['show_as_r'])))
+        # assigned keys get their value from `assignments`, the leftover
+        # transforms for them are garbage produced by `:=` partitioning
+        _set('transforms', MappingProxyType(
+                {kk: tuple(vv) for kk, vv in op['transforms'].items()
+                                if kk not in op['assignments']}))
+        _set('assignments', MappingProxyType(dict(op['assignments'])))
+        _set('star', op['star'])
+        _set('flats', MappingProxyType(dict(op['flats'])))
+        _set('unflats', tuple(op['unflats']))
+        _set('envelope', op['envelope'])
+        _set('exp_only', tuple(op['exp_only']))
+
+    def __setattr__(self, key, val):
+        raise AttributeError('FieldPlan is immutable')
+
+    def __bool__(self):
+        return bool(self.fields)
+
+    def __repr__(self):
+        return 'FieldPlan(%r)' % (','.join(self.fields),)
+
+
+def normalize_fields(fields):
+    if isinstance(fields, str):
+        fields = split_strip(fields)
+
+    return tuple(field.strip() for field in expand_list(fields)
+                                if field.strip())
+
+
+@lru_cache(maxsize=FIELD_PLAN_CACHE_SIZE)
+def _compile_fields(fields):
+    return FieldPlan(process_fields(list(fields)))
+
+
+def compile_fields(fields):
+    if isinstance(fields, FieldPlan):
+        return fields
+
+    return _compile_fields(normalize_fields(fields))
+
+
 def union_fields(f1, f2):
     f1 = process_fields(f1)
     f2 = process_fields(f2)
@@ -134,6 +200,42 @@ def union_fields(f1, f2):
     'a,x,c'
 
 
+class ValueIndex(object):
+    """Groups items by key value. Hashable keys are looked up in a dict,
+    unhashable ones fall back to a linear scan.
+    """
+
+    def __init__(self):
+        self._hashed = {}
+        self._other = []
+
+    def add(self, key, item=None):
+        try:
+            self._hashed.setdefault(key, []).append(item)
+        except TypeError:
+            for kk, items in self._other:
+                if kk == key:
+                    items.append(item)
+                    return
+            self._other.append((key, [item]))
+
+    def get(self, key, default=None):
+        try:
+            return self._hashed.get(key, default)
+        except TypeError:
+            for kk, items in self._other:
+                if kk == key:
+                    return items
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+def ld2l(ld, key):
+    return [it[key] for it in ld]
+
+
 def sort_list(items, by='', reverse=False):
     'sort generic list of basic type or nested dicts'
 
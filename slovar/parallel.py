@@ -0,0 +1,108 @@
+import logging
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+BACKENDS = ('process', 'thread')
+OPS = ('extract', 'update_with')
+
+# per worker state, set once by `_init_worker`
+_worker_func = None
+
+
+def to_plain(obj):
+    # slovar -> dict recursively, so records pickle as builtin types
+    if isinstance(obj, dict):
+        return {kk: to_plain(vv) for kk, vv in obj.items()}
+    elif isinstance(obj, list):
+        return [to_plain(it) for it in obj]
+    return obj
+
+
+def _chunks(iterable, size):
+    iterable = iter(iterable)
+    while True:
+        chunk = list(islice(iterable, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _build_func(op, kw):
+    from slovar import slovar
+
+    if op == 'extract':
+        return slovar.compile_extract(kw.get('fields'), kw.get('defaults'))
+
+    elif op == 'update_with':
+        updater = kw.get('updater') or slovar.compile_update(**kw)
+
+        def _update_with(pair):
+            return updater(*pair)
+        return _update_with
+
+    raise ValueError('unknown op `%s`. must be one of %s' % (op, OPS))
+
+
+def _init_worker(op, kw):
+    global _worker_func
+    _worker_func = _build_func(op, kw)
+
+
+def _run_chunk(chunk):
+    return [to_plain(_worker_func(it)) for it in chunk]
+
+
+def parallel_map(records, op='extract', workers=None, backend='process',
+                                        chunk_size=1000, **kw):
+    """Run `extract` or `update_with` over `records` in a pool of workers.
+
+    For `op='extract'` pass `fields` (and optionally `defaults`), for
+    `op='update_with'` records are `(target, patch)` pairs and the rest of
+    `kw` goes to `update_with` (or pass a compiled `updater`). With
+    `inplace` the process workers' results are written back into the targets.
+    Results are returned in the input order.
+    """
+    from slovar import slovar
+
+    if backend not in BACKENDS:
+        raise ValueError('unknown backend `%s`. must be one of %s' % (backend, BACKENDS))
+
+    if backend == 'thread':
+        func = _build_func(op, kw)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(func, records))
+
+    # fail early on bad op instead of in every worker
+    _build_func(op, kw)
+
+    inplace = False
+    if op == 'update_with':
+        updater = kw.get('updater')
+        inplace = updater.inplace if updater else kw.get('inplace')
+        if inplace:
+            # targets are needed again once the workers are done
+            records = list(records)
+
+        chunks = ([(to_plain(tt), to_plain(pp)) for tt, pp in chunk]
+                                for chunk in _chunks(records, chunk_size))
+    else:
+        chunks = ([to_plain(it) for it in chunk]
+                                for chunk in _chunks(records, chunk_size))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(op, kw)) as pool:
+        for chunk in pool.map(_run_chunk, chunks):
+            results.extend(slovar(it) if isinstance(it, dict) else it for it in chunk)
+
+    if inplace:
+        # workers got pickled copies of the targets
+        for (target, _), result in zip(records, results):
+            target.clear()
+            target.update(result)
+        results = [target for target, _ in records]
+
+    return results
@@ -0,0 +1,124 @@
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def _escape(key):
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(key):
+    return key.replace('~1', '/').replace('~0', '~')
+
+
+def _join(prefix, key, jsonpatch):
+    if jsonpatch:
+        return '%s/%s' % (prefix, _escape(key))
+    return '%s.%s' % (prefix, key) if prefix else str(key)
+
+
+def make_patch(src, dst, jsonpatch=False):
+    """Returns list of changes turning `src` into `dst`:
+
+        {'op': 'add'|'remove'|'replace', 'path': 'a.b.0', 'value': ...}
+
+    Equal subtrees are skipped without descending into them. With
+    `jsonpatch=True` paths are JSON pointers (`/a/b/0`), RFC 6902 style.
+    """
+    ops = []
+    stack = [('', src, dst)]
+
+    while stack:
+        path, aa, bb = stack.pop()
+
+        if aa is bb or aa == bb:
+            continue
+
+        if isinstance(aa, dict) and isinstance(bb, dict):
+            nested = []
+            for key in aa:
+                if key not in bb:
+                    ops.append({'op': 'remove', 'path': _join(path, key, jsonpatch)})
+                else:
+                    nested.append((_join(path, key, jsonpatch), aa[key], bb[key]))
+
+            for key in bb:
+                if key not in aa:
+                    ops.append({'op': 'add', 'path': _join(path, key, jsonpatch), 'value': bb[key]})
+
+            stack.extend(reversed(nested))
+
+        elif isinstance(aa, list) and isinstance(bb, list):
+            common = min(len(aa), len(bb))
+
+            # removes go from the end so earlier indexes stay valid
+            for ix in range(len(aa) - 1, common - 1, -1):
+                ops.append({'op': 'remove', 'path': _join(path, ix, jsonpatch)})
+
+            for ix in range(common, len(bb)):
+                ops.append({'op': 'add', 'path': _join(path, ix, jsonpatch), 'value': bb[ix]})
+
+            stack.extend(reversed([(_join(path, ix, jsonpatch), aa[ix], bb[ix])
+                                            for ix in range(common)]))
+
+        else:
+            ops.append({'op': 'replace', 'path': path, 'value': bb})
+
+    return ops
+
+
+def _split(path):
+    if path.startswith('/'):
+        return [_unescape(it) for it in path[1:].split('/')]
+    return path.split('.') if path else []
+
+
+def _index(ctx, key, op):
+    if key == '-' and op == 'add':
+        return len(ctx)
+    return int(key)
+
+
+def apply_patch(doc, ops, convert=None):
+    """Applies changes from `make_patch` (or a JSON-Patch add/remove/replace
+    list) to `doc` in place. `convert` is called on every new value.
+    """
+    for change in ops:
+        op = change['op']
+        keys = _split(change['path'])
+        value = change.get('value')
+
+        if convert and op != 'remove':
+            value = convert(value)
+
+        if not keys:
+            if op != 'replace':
+                raise ValueError('can not `%s` the document root' % op)
+            doc.clear()
+            doc.update(value)
+            continue
+
+        ctx = doc
+        for key in keys[:-1]:
+            ctx = ctx[int(key)] if isinstance(ctx, list) else ctx[key]
+
+        key = keys[-1]
+        if isinstance(ctx, list):
+            ix = _index(ctx, key, op)
+            if op == 'add':
+                ctx.insert(ix, value)
+            elif op == 'remove':
+                del ctx[ix]
+            elif op == 'replace':
+                ctx[ix] = value
+            else:
+                raise ValueError('unsupported patch op `%s`' % op)
+        else:
+            if op in ('add', 'replace'):
+                ctx[key] = value
+            elif op == 'remove':
+                del ctx[key]
+            else:
+                raise ValueError('unsupported patch op `%s`' % op)
+
+    return doc
@@ -1,6 +1,9 @@
 import re
-from datetime import datetime
-from dateutil import parser as dt_parser, relativedelta as dt_relativedelta
+import threading
+from datetime import datetime, date
+from collections import OrderedDict
+from functools import lru_cache
+from dateutil import parser as dt_parser, relativedelta as dt_relativedelta, tz as dt_tz
 import logging
 
 log = logging.getLogger(__name__)
@@ -17,45 +20,154 @@ def split_strip(_str, on=',', remove_empty=True):
     return lst
 
 
-def str2rdt(strdt):
-    matches = dict(
-        s = 'seconds',
-        m = 'minutes',
-        h = 'hours',
-        d = 'days',
-        M = 'months',
-        y = 'years'
-    )
+DT_CACHE_SIZE = 4096
+
+RELATIVE_UNITS = dict(
+    s = 'seconds',
+    m = 'minutes',
+    h = 'hours',
+    d = 'days',
+    M = 'months',
+    y = 'years'
+)
+
+RELATIVE_RE = re.compile(r'(([-+]?)(\d+))([smhdMy])\b', re.DOTALL)
 
+
+def str2rdt(strdt):
     # is it a relative date ?
-    rg = re.compile('(([-+]?)(\d+))([smhdMy])\\b', re.DOTALL)
-    m = rg.search(strdt)
+    m = RELATIVE_RE.search(strdt)
     if m:
         number = int(m.group(1))
         word = m.group(4)
-        if word in matches:
-            log.debug('relative date detected: %s', {matches[word]:number})
-            return dt_relativedelta.relativedelta(**{matches[word]:number})
+        if word in RELATIVE_UNITS:
+            log.debug('relative date detected: %s', {RELATIVE_UNITS[word]:number})
+            return dt_relativedelta.relativedelta(**{RELATIVE_UNITS[word]:number})
+
+
+@lru_cache(maxsize=1)
+def _utc():
+    # dateutil returns tzlocal() for UTC strings when the local zone is UTC
+    return dt_parser.parse('2000-01-01T00:00Z').tzinfo
+
+
+def _tzinfo(tz):
+    if not tz:
+        return None
+    if tz == 'Z':
+        return _utc()
+
+    sign = -1 if tz[0] == '-' else 1
+    tz = tz[1:].replace(':', '')
+    offset = sign * (int(tz[:2])*3600 + int(tz[2:] or 0)*60)
+    # same tzinfo objects dateutil returns
+    return _utc() if offset == 0 else dt_tz.tzoffset(None, offset)
+
+
+def _from_iso(m):
+    year, month, day, hour, minute, second, fraction, tz = m.groups()
+    return datetime(int(year), int(month), int(day),
+                    int(hour or 0), int(minute or 0), int(second or 0),
+                    int((fraction or '0').ljust(6, '0')), _tzinfo(tz))
+
+
+def _from_us(m):
+    month, day, year, hour, minute, second = m.groups()
+    return datetime(int(year), int(month), int(day),
+                    int(hour or 0), int(minute or 0), int(second or 0))
+
+
+# common shapes parsed without dateutil, with the same results
+DT_FORMATS = [
+    # 2020-01-31, 2020-01-31T10:20:30.123+02:00, 2020-01-31 10:20Z
+    ('iso', re.compile(r'(\d{4})-(\d{2})-(\d{2})'
+                       r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?'
+                       r'(Z|[+-]\d{2}(?::?\d{2})?)?)?$'), _from_iso),
+    # 01/31/2020, 01/31/2020 10:20:30
+    ('us', re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})'
+                      r'(?: (\d{1,2}):(\d{2})(?::(\d{2}))?)?$'), _from_us),
+]
+
+
+class DateParser(object):
+    """`str2dt` with a memo of parsed strings and the last matched format
+    tried first. Use one instance per field or column to have the format
+    inferred from its values. Relative dates (`-1d`) are never memoized.
+    Instances are safe to share between threads.
+    """
+
+    def __init__(self, cache_size=DT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.formats = list(DT_FORMATS)
+        self._memo = OrderedDict()
+        self._today = None
+        self._lock = threading.Lock()
+
+    def parse(self, strdt):
+        # absolute dates only, raises ValueError like dateutil
+        today = date.today()
+
+        with self._lock:
+            if today != self._today:
+                # dateutil fills missing parts (`10:30`, `May 5`) from today
+                self._memo.clear()
+                self._today = today
+
+            dt = self._memo.get(strdt)
+            if dt is not None:
+                self._memo.move_to_end(strdt)
+                return dt
+
+        formats = self.formats
+        for ix, fmt in enumerate(formats):
+            m = fmt[1].match(strdt)
+            if not m:
+                continue
+            try:
+                dt = fmt[2](m)
+            except ValueError:
+                # out of range values, let dateutil decide
+                break
+            if ix:
+                # replaced in one go, other threads may be looping over the old list
+                self.formats = [fmt] + [it for it in formats if it is not fmt]
+            break
+
+        if dt is None:
+            dt = dt_parser.parse(strdt)
+
+        with self._lock:
+            self._memo[strdt] = dt
+            while len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+
+        return dt
+
+    def __call__(self, strdt, _raise=False):
+        if not strdt:
+            raise ValueError('Datetime string can not be empty or None')
+
+        if isinstance(strdt, datetime):
+            return strdt
+
+        dt = str2rdt(strdt)
+        if dt:
+            return datetime.utcnow()+dt
+        try:
+            return self.parse(strdt)
+        except ValueError as e:
+            msg = 'Datetime string `%s` not recognized as datetime. Did you miss +- signs for relative dates?' % strdt
+            if _raise:
+                raise ValueError(msg)
+            else:
+                log.error(msg)
+
+
+_dt_parser = DateParser()
 
 
 def str2dt(strdt, _raise=False):
-    if not strdt:
-        raise ValueError('Datetime string can not be empty or None')
-
-    if isinstance(strdt, datetime):
-        return strdt
-
-    dt = str2rdt(strdt)
-    if dt:
-        return datetime.utcnow()+dt
-    try:
-        return dt_parser.parse(strdt)
-    except ValueError as e:
-        msg = 'Datetime string `%s` not recognized as datetime. Did you miss +- signs for relative dates?' % strdt
-        if _raise:
-            raise ValueError(msg)
-        else:
-            log.error(msg)
+    return _dt_parser(strdt, _raise=_raise)
 
 
 def snake2camel(text):
@@ -0,0 +1,346 @@
+import sys
+import logging
+import builtins
+from datetime import datetime
+from functools import lru_cache
+from bson import ObjectId
+
+from slovar.lists import sort_list, ld2l
+from slovar.strings import str2dt, DateParser
+from slovar.utils import maybe_dotted
+
+log = logging.getLogger(__name__)
+
+TCAST_CACHE_SIZE = 1024
+
+# transforms that take the next token as their argument, ie `sort|-name`
+TCAST_FUNCS = ['sort', 'index', 'concat', 'slice', 'ld2l', 'split']
+
+SEP = {
+    'COMMA': ',',
+    'SPACE': ' ',
+}
+
+# name -> [callable or 'dotted.path:name', takes_arg]
+_registry = {}
+
+
+def register_transform(name, func, takes_arg=False):
+    """Adds a custom `:name` transform. `func` may be a dotted string
+    (`module:func`), imported on first use. Functions with `takes_arg`
+    are called as `func(val, arg)` with the next token as `arg`.
+    """
+    _registry[name] = [func, takes_arg]
+    _compile_tcast.cache_clear()
+
+
+def unregister_transform(name):
+    _registry.pop(name, None)
+    _compile_tcast.cache_clear()
+
+
+def _registered(name):
+    entry = _registry[name]
+    if isinstance(entry[0], str):
+        entry[0] = maybe_dotted(entry[0])
+    return entry[0]
+
+
+def _concat(val, sep=''):
+    sep = SEP.get(sep, sep)
+
+    if isinstance(val, list):
+        return sep.join([str(it) for it in val if it])
+    else:
+        return str(val)
+
+
+def _sort(arg):
+    reverse = False
+    if arg[0] in ['-', '+']:
+        reverse = arg[0] == '-'
+        arg = arg[1:]
+    return lambda val: sort_list(val, arg, reverse=reverse)
+
+
+def _split(arg):
+    return lambda val: val.split(arg) if isinstance(val, str) else val
+
+
+def _with_arg(func, arg):
+    if func == 'sort':
+        return _sort(arg)
+    elif func == 'index':
+        ix = int(arg)
+        return lambda val: val[ix]
+    elif func == 'concat':
+        return lambda val: _concat(val, arg or '')
+    elif func == 'slice':
+        ix = int(arg)
+        return lambda val: val[:ix]
+    elif func == 'ld2l':
+        return lambda val: ld2l(val, arg)
+    elif func == 'split':
+        return _split(arg)
+
+    return lambda val: _registered(func)(val, arg)
+
+
+def _raise(exc):
+    def _call(val):
+        raise exc
+    return _call
+
+
+def _type_method(tr):
+    methods = {}
+
+    def _call(val):
+        _type = type(val)
+        try:
+            method = methods[_type]
+        except KeyError:
+            try:
+                method = getattr(_type, tr)
+            except AttributeError:
+                raise ValueError('type `%s` does not have a method `%s`' % (_type, tr))
+
+            if not callable(method):
+                raise ValueError('`%s` is not a callable for type `%s`' % (tr, _type))
+
+            methods[_type] = method
+
+        return method(val)
+
+    return _call
+
+
+def _builtin(tr):
+    func = getattr(builtins, tr, None)
+    if func is None:
+        return lambda val: getattr(builtins, tr)(val)
+    return func
+
+
+def _slovar_method(tr, method, **kw):
+    from slovar import slovar
+    fallback = _type_method(tr)
+
+    def _call(val):
+        if isinstance(val, slovar):
+            return getattr(val, method)(**kw)
+        return fallback(val)
+
+    return _call
+
+
+def _if_value(func):
+    return lambda val: func(val) if val else val
+
+
+SIMPLE = {
+    'str': str,
+    'unicode': str,
+    'int': int,
+    'float': float,
+    'bool': bool,
+    'dt': _if_value(str2dt),
+    'ts2dt': _if_value(lambda val: datetime.utcfromtimestamp(val).strftime('%Y-%m-%d %H:%M:%S')),
+    'dtob': _if_value(lambda val: ObjectId(val).generation_time),
+    'strip': lambda val: val.strip() if isinstance(val, str) else val,
+}
+
+# transforms `tcast_column` converts a whole column at a time
+COLUMN_CASTS = ('int', 'float', 'bool', 'dt', 'ts2dt')
+
+
+class TcastChain(object):
+    """List of transform tokens (`['str', 'strip', 'sort', '-name']`)
+    compiled to a list of callables.
+    """
+
+    def __init__(self, trs):
+        self.trs = tuple(trs)
+        self.safe = 'safe' in self.trs
+        self.safe_none = 'safe_none' in self.trs
+        self.steps = []
+
+        # set for chains of a single cast `tcast_column` can run in bulk
+        casts = [it for it in self.trs if it not in ('safe', 'safe_none')]
+        self.column_cast = casts[0] if len(casts) == 1 and casts[0] in COLUMN_CASTS else None
+
+        prev_tr = None
+        for tr in self.trs:
+            if 'safe' == tr or 'safe_none' == tr:
+                continue
+
+            elif tr in SIMPLE:
+                self.steps.append(SIMPLE[tr])
+
+            elif tr == 'flat':
+                self.steps.append(_slovar_method(tr, 'flat'))
+
+            elif tr == 'flatall':
+                self.steps.append(_slovar_method(tr, 'flat', keep_lists=False))
+
+            elif tr == 'unflat':
+                self.steps.append(_slovar_method(tr, 'unflat'))
+
+            elif tr in TCAST_FUNCS or (tr in _registry and _registry[tr][1]):
+                prev_tr = tr
+
+            elif prev_tr:
+                try:
+                    self.steps.append(_with_arg(prev_tr, tr))
+                except Exception as e:
+                    # bad argument, fail when the chain runs like any other step
+                    self.steps.append(_raise(e))
+                prev_tr = None
+
+            elif tr in _registry:
+                self.steps.append(lambda val, tr=tr: _registered(tr)(val))
+
+            elif tr.startswith('@'):
+                self.steps.append(_builtin(tr[1:]))
+
+            else:
+                self.steps.append(_type_method(tr))
+
+    def failed(self, val, key, error_klass):
+        msg = 'typecast failed for key=`%s`, value=`%s`: %s' % (key, val, sys.exc_info()[1])
+        log.error(msg)
+
+        if self.safe:
+            return val
+        elif self.safe_none:
+            return None
+        else:
+            raise error_klass(msg)
+
+    def __call__(self, val, key=None, error_klass=ValueError):
+        for step in self.steps:
+            try:
+                val = step(val)
+            except:
+                return self.failed(val, key, error_klass)
+
+        return val
+
+    def __repr__(self):
+        return 'TcastChain(%r)' % '|'.join(self.trs)
+
+
+@lru_cache(maxsize=TCAST_CACHE_SIZE)
+def _compile_tcast(trs):
+    return TcastChain(trs)
+
+
+def compile_tcast(trs):
+    if isinstance(trs, TcastChain):
+        return trs
+    return _compile_tcast(tuple(trs))
+
+_NOTHING = object()
+
+# datetime.utcfromtimestamp range, years 1..9999
+_TS_MIN = -62135596800
+_TS_MAX = 253402300799
+
+
+def _import_numpy():
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+
+def _numpy_cast(numpy, values, tr):
+    # only for columns that are already numeric, where numpy conversion
+    # gives the same results as the python builtins. None otherwise.
+    try:
+        arr = numpy.asarray(values)
+    except (TypeError, ValueError):
+        return None
+
+    if arr.ndim != 1 or arr.dtype.kind not in 'biuf':
+        return None
+
+    if tr == 'float':
+        return arr.astype(float)
+
+    elif tr == 'bool':
+        return arr.astype(bool)
+
+    elif tr == 'int':
+        if arr.dtype.kind == 'f' and len(arr) and \
+                not (numpy.isfinite(arr).all() and numpy.abs(arr).max() < 2**63):
+            return None
+        if arr.dtype.kind == 'u' and len(arr) and arr.max() >= 2**63:
+            return None
+        return arr.astype(numpy.int64)
+
+    elif tr == 'ts2dt':
+        # falsy timestamps are left as is, same as in `tcast`
+        if arr.dtype.kind not in 'iu' or len(arr) and \
+                (arr.min() < _TS_MIN or arr.max() > _TS_MAX):
+            return None
+        strings = numpy.datetime_as_string(arr.astype('datetime64[s]'), unit='s')
+        originals = numpy.empty(len(values), dtype=object)
+        originals[:] = values
+        return numpy.where(arr != 0, numpy.char.replace(strings, 'T', ' '), originals)
+
+    return None
+
+
+def _cast_all(chain, func, values, key, error_klass, numpy):
+    if numpy:
+        arr = _numpy_cast(numpy, values, chain.column_cast)
+        if arr is not None:
+            return arr.tolist()
+
+    try:
+        return list(map(func, values))
+    except Exception:
+        pass
+
+    # some values failed, redo it one by one to apply `safe`/`safe_none`
+    result = []
+    append = result.append
+    for val in values:
+        try:
+            append(func(val))
+        except Exception:
+            append(chain.failed(val, key, error_klass))
+
+    return result
+
+
+def tcast_column(values, trs, key=None, error_klass=ValueError,
+                                        skip=_NOTHING, numpy=None):
+    """Applies transforms `trs` to every value in `values` and returns a list.
+
+    Single `int`, `float`, `bool`, `dt` or `ts2dt` casts run over the whole
+    column, with numpy when it is installed and the column is numeric.
+    Other chains fall back to `tcast` per value. `safe`/`safe_none` apply
+    per element. Values that are `skip` (ie a missing field marker) become
+    None without being cast.
+    """
+    chain = compile_tcast(trs)
+
+    if not chain.column_cast:
+        return [None if val is skip else chain(val, key, error_klass)
+                        for val in values]
+
+    numpy = numpy or _import_numpy()
+    func = chain.steps[0]
+    if chain.column_cast == 'dt':
+        # own parser, so the date format is inferred for this column
+        func = _if_value(DateParser())
+
+    present = [val for val in values if val is not skip]
+    if len(present) == len(values):
+        return _cast_all(chain, func, present, key, error_klass, numpy)
+
+    casted = iter(_cast_all(chain, func, present, key, error_klass, numpy))
+    return [None if val is skip else next(casted) for val in values]
@@ -205,3 +205,553 @@ class TestSlovar():
         dd = slovar(c=[0,1,2])
         ddd = slovar(c=[1,2]).diff(dd)
         assert ddd.c == [0,1,2]
+
+    def test_compile_fields(self):
+        from slovar.lists import compile_fields, FieldPlan
+
+        plan = compile_fields('a, b.*,c:int')
+        assert isinstance(plan, FieldPlan)
+        assert compile_fields(['a', 'b.*', 'c:int']) is plan
+        assert compile_fields(plan) is plan
+
+        with pytest.raises(AttributeError):
+            plan.star = True
+
+        d1 = slovar(a=1, b=dict(x=1, y=2), c='3')
+        assert d1.extract(plan) == {'a': 1, 'x': 1, 'y': 2, 'c': 3}
+        # expanded `.*` keys must not leak into the cached plan
+        assert plan.exp_only == ('a', 'b.*', 'c')
+        assert d1.extract(plan) == d1.extract('a,b.*,c:int')
+        assert d1.subset(plan) == {'a': 1, 'x': 1, 'y': 2, 'c': '3'}
+
+    def test_compile_extract(self):
+        ex = slovar.compile_extract('a,b.c__as__bc,d:int,e:=1:int', defaults={'f': 2})
+        assert ex({'a': 1, 'b': {'c': 3}, 'd': '4'}) == {
+            'a': 1, 'bc': 3, 'd': 4, 'e': 1, 'f': 2}
+
+        ex = slovar.compile_extract('a,b')
+        assert ex.stages == []
+        assert ex(slovar(a=1, b=2, c=3)) == {'a': 1, 'b': 2}
+        assert isinstance(ex({'a': {'x': 1}})['a'], slovar)
+
+        # plain dicts are not converted upfront, only the extracted values are
+        class NoCopy(dict):
+            def __iter__(self):
+                raise AssertionError('converted')
+            keys = __iter__
+
+        raw = {'a': {'x': 1}, 'b': 2, 'c': NoCopy(y=1)}
+        result = ex(raw)
+        assert result == {'a': {'x': 1}, 'b': 2}
+        result.a.x = 2
+        assert raw['a'] == {'x': 1}
+
+    def test_iter_extract(self):
+        records = ({'a': ix, 'b': ix * 2} for ix in range(5))
+        result = slovar.iter_extract(records, 'a')
+        assert next(result) == {'a': 0}
+        assert list(result) == [{'a': ix} for ix in range(1, 5)]
+
+        chunks = list(slovar.iter_extract([{'a': ix} for ix in range(5)], 'a', chunk_size=2))
+        assert [len(it) for it in chunks] == [2, 2, 1]
+
+    @pytest.mark.parametrize('backend', ['thread', 'process'])
+    def test_parallel_map(self, backend):
+        records = [slovar(a=ix, b=dict(c=ix)) for ix in range(10)]
+        result = slovar.parallel_map(records, fields='a:str,b.c', workers=2,
+                                     backend=backend, chunk_size=3)
+        assert result == [{'a': str(ix), 'b': {'c': ix}} for ix in range(10)]
+        assert isinstance(result[0].b, slovar)
+
+        pairs = [(dict(a=[1]), dict(a=[ix])) for ix in range(4)]
+        result = slovar.parallel_map(pairs, op='update_with', append_to='a',
+                                     workers=2, backend=backend)
+        assert result == [{'a': [1, ix]} for ix in range(4)]
+
+        with pytest.raises(ValueError):
+            slovar.parallel_map(records, op='bad', backend=backend)
+
+    def test_to_columns(self):
+        from array import array
+
+        records = [dict(a=1, b='2', c=3), dict(a=4, b='5'), slovar(a=7, b='8', c=9)]
+        cols = slovar.to_columns(records, 'a,b:int,c__as__x')
+        assert cols == {'a': [1, 4, 7], 'b': [2, 5, 8], 'x': [3, None, 9]}
+
+        cols = slovar.to_columns(records, 'a,b:int', typed=True)
+        assert cols['b'] == array('q', [2, 5, 8])
+        assert isinstance(cols['a'], list)
+
+        # complex specs go through the full extractor
+        cols = slovar.to_columns(records, 'a,c,d:=1:int')
+        assert cols == {'a': [1, 4, 7], 'c': [3, None, 9], 'd': [1, 1, 1]}
+
+    def test_copy(self):
+        from bson import ObjectId
+
+        shared = [1]
+        oid = ObjectId()
+        d1 = slovar(a=dict(b=dict(c=1)), l=[dict(x=1), shared, shared], o=oid, s={1})
+        d2 = d1.copy()
+        assert d2 == d1
+        assert type(d2) is slovar and isinstance(d2.a.b, slovar)
+        assert d2.l[1] is d2.l[2]
+        assert d2.o is oid and d2.s is not d1.s
+
+        d2.a.b.c = 2
+        d2.l[0].x = 2
+        d2.l[1].append(2)
+        assert d1 == {'a': {'b': {'c': 1}}, 'l': [{'x': 1}, [1], [1]], 'o': oid, 's': {1}}
+
+        d1.l.append(d1)
+        d2 = d1.deepcopy()
+        assert d2.l[-1] is d2
+
+    def test_lazy_convert(self):
+        raw = dict(b=dict(c=1))
+        d1 = slovar.lazy(a=raw, l=[dict(x=1), 2])
+        assert dict.__getitem__(d1, 'a') is raw
+        assert dict.__getitem__(d1.a, 'b') is raw['b']
+
+        assert isinstance(d1.a, slovar)
+        assert d1.a is d1['a']
+        assert d1.a.b.c == 1
+        assert isinstance(d1['l'][0], slovar)
+        assert d1.nested_get('a.b.c') == 1
+        assert d1.flat() == {'a.b.c': 1, 'l': [{'x': 1}, 2]}
+
+        d1.n = dict(m=dict(k=1))
+        assert isinstance(d1.n.m, slovar)
+        assert isinstance(slovar(a=raw).a.b, slovar)
+        assert d1.copy() == d1
+
+        # plain slovars keep the dict methods, only lazy ones override them
+        assert slovar.get is dict.get and slovar.items is dict.items
+        assert type(slovar(a=raw)) is slovar
+
+        import pickle
+        d1 = slovar.lazy(a=raw)
+        d2 = d1.copy()
+        assert type(d2) is type(d1) and dict.__getitem__(d2, 'a') is not raw
+        assert isinstance(d2.a, slovar)
+        assert isinstance(dict(d1)['a'], slovar)
+
+        d2 = pickle.loads(pickle.dumps(slovar.lazy(a=raw)))
+        assert type(d2) is slovar and isinstance(dict.__getitem__(d2, 'a'), slovar)
+
+    def test_nested_path(self):
+        from slovar.dictionaries import compile_path, Path
+
+        path = compile_path('a.0.b')
+        assert isinstance(path, Path)
+        assert path.keys == ('a', '0', 'b')
+        assert path.indexes == (None, 0, None)
+        assert compile_path('a.0.b') is path
+
+        d1 = slovar(a=[dict(b=dict(c=1))])
+        leaf = d1.nested_get(path)
+        assert leaf is d1.a[0].b
+        assert d1.nested_get('a.0.b', copy=True) is not leaf
+        assert d1.nested_in(compile_path('a'))
+
+        d2 = d1.nested_pop(path)
+        assert d2 == {'a': [{}]} and d1.a[0].b == {'c': 1}
+        assert d1.nested_pop('a.0.b', copy=False) is d1
+        assert d1 == {'a': [{}]}
+
+    def test_iter_flat(self):
+        from slovar.dictionaries import iter_flat
+
+        d1 = slovar(a=dict(b=[1, dict(c=2)]), d=1)
+        assert list(d1.iter_flat()) == list(d1.flat().items())
+        assert dict(iter_flat(d1, keep_lists=False)) == {'a.b.0': 1, 'a.b.1.c': 2, 'd': 1}
+        assert slovar(d1.flat(keep_lists=False)).unflat() == d1
+
+        # module level `flat` descends into lists by default
+        assert flat(d1) == {'a.b.0': 1, 'a.b.1.c': 2, 'd': 1}
+
+    def test_value_index(self):
+        from slovar.lists import ValueIndex
+
+        index = ValueIndex()
+        index.add(1, 'a')
+        index.add([1], 'b')
+        index.add(1, 'c')
+        assert index.get(1) == ['a', 'c']
+        assert index.get([1]) == ['b']
+        assert {'x': 1} not in index
+
+    def test_update_with_list_ops_unhashable(self):
+        d1 = slovar(a=[dict(k=[1], v=1), dict(k=[2], v=2), dict(k=3, v=3), dict(k=3, v=4)])
+
+        d2 = d1.update_with(dict(a=[dict(k=[2], v=22)]), merge_to='a:k')
+        assert [it.v for it in d2.a] == [1, 22, 3, 4]
+
+        # nothing to merge into, patch items are not looked into
+        assert slovar().update_with({'a': [1, 2]}, merge_to='a:k') == {'a': []}
+        assert slovar(a=[]).update_with({'a': [1, 2]}, merge_to='a:k') == {'a': []}
+
+        d2 = d1.update_with(dict(a=[dict(k=[1]), dict(k=3)]), remove_from='a:k')
+        assert d2.a == [dict(k=[2], v=2)]
+
+        d1 = slovar(a=[dict(k=[1], v=1), dict(k=[2], v=2)])
+        d2 = d1.update_with(dict(a=[dict(k=[1], v=11)]), append_to_set='a:k')
+        assert d2.a == [dict(k=[1], v=11), dict(k=[2], v=2)]
+
+    def test_update_with_inplace(self):
+        d1 = slovar(a=1, l=[1], aa=dict(b=[dict(k=1, v=1)], c=2))
+        patch = slovar(l=[2], aa=dict(b=[dict(k=1, v=2), dict(k=2, v=2)]))
+
+        expected = d1.update_with(patch, append_to_set=['aa.b:k'], append_to='l', flatten=['aa'])
+        result = d1.update_with(patch, append_to_set=['aa.b:k'], append_to='l', flatten=['aa'],
+                                inplace=True)
+        assert result is d1
+        assert d1 == expected
+
+        d2 = slovar(a=dict(b=1))
+        assert d2.update_with(slovar(a=dict(c=2)), flatten=True, inplace=True) is d2
+        assert d2 == {'a': {'b': 1, 'c': 2}}
+
+        # flatten naming a leaf or a list path gives the same result in place
+        for flatten, kw in [(['a.b'], {}), (['a'], dict(append_to=['a.b'])),
+                            (['a', 'x.y'], {}), (['a.c'], dict(overwrite=False))]:
+            d3 = slovar(a=dict(b=[1], c=1), x=dict(y=1))
+            patch = slovar(a=dict(b=[2], c=2), x=dict(y=2))
+            expected = d3.update_with(patch, flatten=flatten, **kw)
+            assert d3.update_with(patch, flatten=flatten, inplace=True, **kw) == expected
+
+    def test_compile_update(self):
+        update = slovar.compile_update(append_to_set=['a.b:k'], flatten=['a'])
+        pairs = [({'a': {'b': [{'k': ix}]}}, {'a': {'b': [{'k': ix}, {'k': -ix}]}}) for ix in range(1, 4)]
+
+        expected = [slovar(t).update_with(slovar(p), append_to_set=['a.b:k'], flatten=['a'])
+                                            for t, p in pairs]
+        assert list(update.apply(pairs)) == expected
+        assert update.map(pairs) == expected
+        assert update.map(pairs, backend='thread', workers=2) == expected
+        assert update.map(pairs, backend='process', workers=2) == expected
+
+        with pytest.raises(ValueError):
+            slovar.compile_update(append_to='a.b')
+
+        # inplace updates the caller's mapping even when it is a plain dict
+        target = {'a': [1], 'c': 1}
+        update = slovar.compile_update(append_to=['a'], inplace=True)
+        assert update(target, {'a': [2], 'd': 2}) is target
+        assert target == {'a': [1, 2], 'c': 1, 'd': 2}
+
+        for flatten in [True, ['a']]:
+            target = {'a': {'b': [1]}, 'c': 1}
+            update = slovar.compile_update(append_to=['a.b'], flatten=flatten, inplace=True)
+            assert update(target, {'a': {'b': [2]}, 'd': 2}) is target
+            assert target == {'a': {'b': [1, 2]}, 'c': 1, 'd': 2}
+
+        update = slovar.compile_update(append_to=['a'], inplace=True)
+        for backend in ['thread', 'process']:
+            targets = [slovar(a=[1]), {'a': [1]}]
+            results = update.map([(tt, {'a': [2]}) for tt in targets], backend=backend, workers=2)
+            assert all(rr is tt for rr, tt in zip(results, targets))
+            assert targets == [{'a': [1, 2]}] * 2
+
+    def test_diff_patch(self):
+        d1 = slovar(a=1, b=dict(c=[1, 2, 3], d='x'), e=[dict(f=1)], g=1)
+        d2 = slovar(a=2, b=dict(c=[1, 5], d='x', n=dict(m=1)), e=[dict(f=1), 4])
+
+        patch = d1.diff_patch(d2)
+        assert {'op': 'replace', 'path': 'a', 'value': 2} in patch
+        assert {'op': 'remove', 'path': 'g'} in patch
+        assert {'op': 'remove', 'path': 'b.c.2'} in patch
+        assert not [it for it in patch if it['path'].startswith('b.d')]
+
+        result = d1.apply_patch(patch)
+        assert result == d2
+        assert isinstance(result.b.n, slovar)
+        assert d1.g == 1
+
+        patch = d1.diff_patch(d2, jsonpatch=True)
+        assert {'op': 'replace', 'path': '/b/c/1', 'value': 5} in patch
+        assert d1.apply_patch(patch) == d2
+
+        assert d1.diff_patch(d1.copy()) == []
+
+    def test_fingerprint(self):
+        from bson import ObjectId
+
+        oid = ObjectId()
+        now = datetime(2020, 1, 1, 10)
+        d1 = slovar(a=1, b=dict(c=[1, dict(x=now)], d=oid))
+        d2 = slovar(b=dict(d=oid, c=[1, dict(x=now)]), a=1)
+
+        assert d1.fingerprint() == d2.fingerprint()
+        assert slovar(a=1).fingerprint() != slovar(a='1').fingerprint()
+        assert slovar(a=[1, 2]).fingerprint() != slovar(a=[2, 1]).fingerprint()
+        assert slovar(a=None).fingerprint() != slovar(a='None').fingerprint()
+
+        fp = d1.fingerprint()
+        d1.b.c[1].x = datetime(2021, 1, 1)
+        assert d1.fingerprint() != fp
+        d1.b.c[1].x = now
+        assert d1.fingerprint() == fp
+
+    def test_extract_cache(self):
+        from slovar.cache import ExtractCache
+
+        now = [0]
+        cache = ExtractCache(maxsize=2, ttl=10, timer=lambda: now[0])
+        d1 = slovar(a=1, b=dict(c=2))
+
+        r1 = d1.extract('a,b.c', cache=cache, cache_key=(1, 1))
+        r2 = d1.extract('a, b.c', cache=cache, cache_key=(1, 1))
+        assert r1 == r2 == {'a': 1, 'b': {'c': 2}}
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        r2.b.c = 3
+        assert d1.extract('a,b.c', cache=cache, cache_key=(1, 1)).b.c == 2
+
+        x = slovar(d1.extract('a,b', cache=cache, cache_key=(1, 1)))
+        x.b.c = 99
+        assert d1.extract('a,b', cache=cache, cache_key=(1, 1)).b.c == 2
+
+        d1.extract('a,b.c', cache=cache)
+        d1.extract('a,x:=__NOW__', cache=cache, cache_key=(1, 1))
+        assert cache.skips == 2
+
+        now[0] = 11
+        d1.extract('a,b.c', cache=cache, cache_key=(1, 1))
+        assert cache.misses == 3
+
+        d1.extract('a', cache=cache, cache_key=(1, 1))
+        d1.extract('a', cache=cache, cache_key=(1, 2))
+        assert len(cache) == 2
+        assert cache.stats()['evictions'] == 3
+
+        cache = ExtractCache(max_bytes=1)
+        d1.extract('a', cache=cache, cache_key=(1, 1))
+        assert len(cache) == 0
+
+    def test_tcast_compiled(self):
+        from slovar.transforms import compile_tcast
+
+        chain = compile_tcast(['split', ',', 'index', '1', 'strip', 'upper'])
+        assert compile_tcast(('split', ',', 'index', '1', 'strip', 'upper')) is chain
+        assert chain('a, b ,c') == 'B'
+        assert slovar().tcast('k', 'x', ['int', 'safe_none']) is None
+        with pytest.raises(ValueError):
+            slovar().tcast('k', 'x', ['int'])
+
+    def test_register_transform(self):
+        from slovar import register_transform, unregister_transform
+
+        register_transform('double', lambda val: val * 2)
+        register_transform('splitstrip', 'slovar.strings:split_strip', takes_arg=True)
+        try:
+            assert slovar(a=2, b=' x;y ').extract('a:double,b:splitstrip|;') == {'a': 4, 'b': ['x', 'y']}
+        finally:
+            unregister_transform('double')
+            unregister_transform('splitstrip')
+
+        with pytest.raises(ValueError):
+            slovar(a=2).extract('a:double')
+
+    def test_tcast_column(self):
+        from slovar.transforms import tcast_column
+
+        assert tcast_column(['1', 2, 3.5], ['int']) == [1, 2, 3]
+        assert tcast_column([1, 0, ''], ['bool']) == [True, False, False]
+        assert tcast_column(['1', 'x', '3'], ['float', 'safe']) == [1.0, 'x', 3.0]
+        assert tcast_column(['1', 'x'], ['int', 'safe_none']) == [1, None]
+        assert tcast_column([' a', 'b '], ['strip', 'upper']) == ['A', 'B']
+
+        with pytest.raises(ValueError):
+            tcast_column(['1', 'x'], ['int'])
+
+        skip = object()
+        assert tcast_column(['1', skip, '3'], ['int'], skip=skip) == [1, None, 3]
+
+        cols = slovar.to_columns([dict(a='1'), dict(b=1), dict(a='x')], 'a:int|safe_none')
+        assert cols == {'a': [1, None, None]}
+
+    def test_tcast_column_numpy(self):
+        pytest.importorskip('numpy')
+        from slovar.transforms import tcast_column
+
+        assert tcast_column([1.7, -2.2, 3], ['int']) == [1, -2, 3]
+        assert tcast_column([float('nan'), 1], ['int', 'safe_none']) == [None, 1]
+        assert tcast_column([0, 86400], ['ts2dt']) == [0, '1970-01-02 00:00:00']
+
+    def test_str2dt_fast(self):
+        from dateutil import parser, tz
+        from slovar.strings import str2dt, DateParser
+
+        for val in ['2020-01-31', '2020-01-31T10:20:30', '2020-01-31 10:20:30.5',
+                    '2020-01-31T10:20:30.123456+02:00', '2020-01-31T10:20Z',
+                    '01/31/2020', '1/31/2020 10:20', 'Jan 31 2020', '2020-02-30 10:00']:
+            try:
+                expected = parser.parse(val)
+            except ValueError:
+                assert str2dt(val) is None
+                continue
+            assert str2dt(val) == expected
+            assert str2dt(val).tzinfo == expected.tzinfo
+
+        dp = DateParser(cache_size=2)
+        dp('01/31/2020')
+        assert dp.formats[0][0] == 'us'
+        dp('2020-01-01')
+        dp('2020-01-02')
+        assert len(dp._memo) == 2
+
+        from concurrent.futures import ThreadPoolExecutor
+        values = ['01/%02d/2020' % (ix % 28 + 1) if ix % 2 else '2020-01-%02d' % (ix % 28 + 1)
+                                                            for ix in range(2000)]
+        with ThreadPoolExecutor(4) as pool:
+            assert list(pool.map(dp, values)) == [parser.parse(it) for it in values]
+
+        assert str2dt('-1d') < datetime.utcnow()
+        assert str2dt('+1d') > datetime.utcnow()
+
+    def test_flat_get(self):
+        from slovar.dictionaries import flat_get
+
+        d1 = slovar(a=dict(b=dict(c=1), e={}, l=[1]), **{'x.y': 2, 'z': {'0': 3}})
+        for key in ['a.b.c', 'a.e', 'a.l', 'x.y', 'z.0', 'a.b', 'a', 'a.x', 'a.l.0']:
+            assert flat_get(d1, key, 'missing') == d1.flat().get(key, 'missing')
+
+        assert d1.fget('a.b.c') == 1
+        assert d1.fget('a.b', 5) == 5
+
+        assert d1.has(['a', 'a.b.c', 'x.y'], check_type=None)
+        with pytest.raises(ValueError):
+            d1.has('a.b', check_type=None)
+
+        d1.set_default('a.b.c', 2)
+        d1.set_default('a.b.d', 3)
+        assert d1.a.b == {'c': 1, 'd': 3}
+
+    def test_compile_has(self):
+        validate = slovar.compile_has({
+            'name': str,
+            'age': dict(type=int, required=False),
+            'meta.status': dict(allowed=['new', 'done']),
+            'meta.tags': dict(type=list, forbidden=[['x']], err='bad tags: %s'),
+        })
+
+        assert validate(slovar(name='a', meta=dict(status='new', tags=[])))
+
+        errors = validate.check(dict(age='1', meta=dict(status='old', tags=['x'])))
+        assert [(it['path'], it['code']) for it in errors] == [
+            ('name', 'missing'), ('age', 'type'), ('meta.status', 'allowed'), ('meta.tags', 'forbidden')]
+        assert errors[-1]['message'].startswith('bad tags: ')
+
+        with pytest.raises(ValueError):
+            validate(dict(name=1, meta=dict(status='new', tags=[])))
+
+        records = [dict(name='a', meta=dict(status='new', tags=[])), dict(name='b')]
+        assert [ix for ix, _ in validate.check_many(records)] == [1]
+
+    def test_convert_schema(self):
+        from slovar.convert import Schema
+
+        schema = Schema({
+            'page': dict(type='int', default=1),
+            'fields': dict(type='list', pop=True, set_as='_fields'),
+            'debug': 'bool',
+            'ids': dict(type='list', itype=int, allow_missing=True),
+            'sort': dict(raise_on_values=['password'], mod=str.upper, allow_missing=True),
+        })
+
+        params = slovar(fields='a, b', debug='yes', page='3')
+        assert params.parse(schema) == {'page': 3, '_fields': ['a', 'b'], 'debug': True}
+        assert params == {'page': 3, '_fields': ['a', 'b'], 'debug': True}
+
+        with pytest.raises(ValueError) as e:
+            slovar(debug='maybe', ids='1,x', sort='password').parse(schema)
+        assert 'Missing' in str(e.value) and 'password' in str(e.value)
+
+        result, errors = schema.parse(slovar(fields='', debug=0))
+        assert result == {'page': 1, '_fields': [], 'debug': False}
+        assert not errors
+
+        assert slovar(a='1').asint('a', 5) == 1
+
+    def test_decode_qs(self):
+        from slovar.convert import decode_qs
+
+        qs = 'a[b][]=1&a[b][]=2&c.d=3&e=1&e=2&f[0]=x&f[1]=y&g=&p=5'
+        assert decode_qs(qs, hints={'p': 'int', 'e': int}) == {
+            'a': {'b': ['1', '2']}, 'c': {'d': '3'}, 'e': [1, 2],
+            'f': ['x', 'y'], 'g': '', 'p': 5}
+
+        d1 = decode_qs(qs)
+        d1.a.b.append('3')
+        assert decode_qs(qs).a.b == ['1', '2']
+
+        assert slovar(q='x[]=1&y=yes').asqs('q', hints={'y': 'bool'}) == {'x': ['1'], 'y': True}
+        assert slovar(q='c.d=3').asqs('q') == {'c.d': '3'}
+
+        with pytest.raises(ValueError):
+            decode_qs('a=1&a.b=2')
+
+        # big indexes are kept as keys instead of padding a list up to them
+        assert decode_qs('a[2000000]=1&b.3=x&c[100][x]=y') == {
+            'a': {'2000000': '1'}, 'b': [{}, {}, {}, 'x'], 'c': [{}] * 100 + [{'x': 'y'}]}
+        with pytest.raises(ValueError):
+            decode_qs('a[0]=1&a[101]=2')
+
+    def test_asrange_lazy(self):
+        rng = slovar(r='1-1000000').asrange('r', lazy=True)
+        assert len(rng) == 1000000
+        assert rng[0] == '1' and rng[-1] == '1000000'
+        assert rng.bounds == ('1', '1000000')
+        assert '500' in rng and 500 not in rng and '0' not in rng
+
+        assert rng[10:13] == ['11', '12', '13']
+        assert rng[10:13].bounds == ('11', '13')
+
+        rng = slovar(r='3-5').asrange('r', typecast=int, lazy=True)
+        assert list(rng) == [3, 4, 5] == slovar(r='3-5').asrange('r', typecast=int)
+        assert slovar(r='5-3').asrange('r', lazy=True).bounds is None
+
+    def test_json_dump_iter(self):
+        import io, json
+        from slovar.json import json_dumps, json_dump_iter, set_json_backend
+
+        d1 = slovar(a=1, b=[1, 'ü', None], c=dict(d=datetime(2020, 1, 1, 10, 0, 0, 5)),
+                    **{'1': 2.5, 'e': set([1])})
+        for body in [d1, [d1, 1, 'x'], [], {}, 'x', 1]:
+            fp = io.StringIO()
+            json_dump_iter(body, fp, chunk_size=4)
+            assert fp.getvalue() == json_dumps(body)
+
+        fp = io.StringIO()
+        json_dump_iter((dict(a=ix) for ix in range(3)), fp)
+        assert json.loads(fp.getvalue()) == [{'a': 0}, {'a': 1}, {'a': 2}]
+
+        pytest.importorskip('orjson')
+        set_json_backend('orjson')
+        try:
+            assert json.loads(d1.json()) == json.loads(json.dumps(d1, default=str)) | {
+                'c': {'d': '2020-01-01T10:00:00'}, 'e': '{1}'}
+            fp = io.StringIO()
+            d1.json_dump(fp)
+            assert fp.getvalue() == d1.json()
+            assert json_dumps({'a': 2**70}) == '{"a": %d}' % 2**70
+        finally:
+            set_json_backend('json')
+
+        with pytest.raises(ValueError):
+            set_json_backend('bad')
+
+    def test_extract_isolated(self):
+        d1 = slovar(a=dict(b=dict(c=1), l=[dict(y=1)]))
+
+        d1.extract('a.b').a.b.c = 99
+        d1.extract('a.*').b.c = 99
+        assert d1.a.b.c == 1
+
+        result = d1.extract('a.l__as__l,l..x:=1')
+        assert result.l == [{'y': 1, 'x': '1'}]
+        assert d1.a.l == [{'y': 1}]
+
+        d1.extract('a.b__as__x').x.c = 99
+        assert d1.a.b.c == 1